@@ -0,0 +1,118 @@
+"""
+Side-by-side multi-model benchmark (arena) for LLMApp
+Streams the same prompt to several models concurrently and measures
+time-to-first-token, total latency, output tokens/sec and token usage
+"""
+import csv
+import io
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+from memory import count_tokens
+
+RESULT_FIELDS = [
+    "timestamp",
+    "model",
+    "provider",
+    "prompt_chars",
+    "ttft_s",
+    "total_latency_s",
+    "output_tokens",
+    "tokens_per_s",
+    "prompt_tokens",
+    "completion_tokens",
+    "total_tokens",
+    "usage_source",
+    "error",
+]
+
+
+def _stream_worker(app, prompt, system_prompt, temperature, max_tokens, events):
+    """Stream one model's answer, pushing ("token" | "done", model, payload) events"""
+    started = time.perf_counter()
+    first_token_at = None
+    parts = []
+    error = None
+
+    try:
+        for delta in app.stream_once(prompt, system_prompt, temperature, max_tokens):
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            parts.append(delta)
+            events.put(("token", app.model, delta))
+    except Exception as e:
+        error = str(e)
+    finished = time.perf_counter()
+
+    usage = getattr(app, "last_usage", None)
+    completion_tokens = getattr(usage, "completion_tokens", None)
+    output_tokens = completion_tokens if completion_tokens is not None else count_tokens("".join(parts))
+    # Generation rate after the first token, so queueing/prefill time is not counted twice
+    generation_time = finished - (first_token_at or finished)
+
+    result = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "model": app.model,
+        "provider": app.provider,
+        "prompt_chars": len(prompt),
+        "ttft_s": round(first_token_at - started, 4) if first_token_at else None,
+        "total_latency_s": round(finished - started, 4),
+        "output_tokens": output_tokens,
+        "tokens_per_s": round(output_tokens / generation_time, 2) if generation_time > 0 else None,
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "completion_tokens": completion_tokens,
+        "total_tokens": getattr(usage, "total_tokens", None),
+        "usage_source": "provider" if usage else "estimated",
+        "error": error,
+        "response": "".join(parts),
+    }
+    events.put(("done", app.model, result))
+
+
+def run_arena(apps, prompt, system_prompt=None, temperature=0.5, max_tokens=1024):
+    """
+    Send the same prompt to every app concurrently
+
+    Streaming happens on worker threads; events are yielded on the calling
+    thread so UIs (e.g. Streamlit) can update their own placeholders.
+
+    Args:
+        apps: List of LLMApp instances (one per model)
+        prompt: The user's message
+        system_prompt: Optional system prompt to set context
+        temperature: Sampling temperature (0-2)
+        max_tokens: Maximum tokens in each response
+
+    Yields:
+        ("token", model, text_delta) while answers stream, then
+        ("done", model, result_dict) once per model
+    """
+    events = queue.Queue()
+    workers = [
+        threading.Thread(
+            target=_stream_worker,
+            args=(app, prompt, system_prompt, temperature, max_tokens, events),
+            daemon=True,
+        )
+        for app in apps
+    ]
+    for worker in workers:
+        worker.start()
+
+    remaining = len(workers)
+    while remaining:
+        event = events.get()
+        if event[0] == "done":
+            remaining -= 1
+        yield event
+
+
+def results_to_csv(results):
+    """Serialize benchmark results to CSV text (response bodies are left out)"""
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=RESULT_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    writer.writerows(results)
+    return buf.getvalue()
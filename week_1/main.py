@@ -3,13 +3,27 @@ Simple LLM Application using Groq API
 Week 1 - Core functionality with chatbot identity
 Supports both Groq models (Llama) and OpenAI models (GPT-5 family)
 """
-from groq import Groq
-from openai import OpenAI
+import asyncio
+from collections import deque
+from contextlib import contextmanager
+from groq import Groq, AsyncGroq
+from openai import OpenAI, AsyncOpenAI
 from appconfig import env_config
+from memory import ConversationMemory, count_message_tokens
+from cache import make_cache_key
+
+# Per-turn stats kept in memory (oldest are dropped first)
+TURN_STATS_LIMIT = 1000
+
+SUMMARY_PROMPT = (
+    "Summarize the conversation below in a few sentences. Keep names, facts, "
+    "decisions and open questions; drop pleasantries."
+)
 
 class LLMApp:
 
-    def __init__(self, api_key=None, model="llama-3.3-70b-versatile", chatbot_name="Thoth", default_system_prompt=None):
+    def __init__(self, api_key=None, model="llama-3.3-70b-versatile", chatbot_name="Thoth", default_system_prompt=None,
+                 history_max_tokens=None, summarize_history=False, cache=None, session_manager=None):
         """
         Initialize the LLM application
         
@@ -18,13 +32,30 @@ class LLMApp:
             model: Model to use for completions
             chatbot_name: Name/identity for the chatbot (default: "Thoth")
             default_system_prompt: Default system prompt if user doesn't provide one
-            conversation_history: List of conversations in a session
+            history_max_tokens: Token budget for the resent history (default: per-model budget)
+            summarize_history: Fold turns evicted from the history into a rolling summary
+            cache: Optional response cache (e.g. cache.ResponseCache) consulted before each call
+            session_manager: Optional sessions.SessionManager holding per-user histories,
+                             selected with `session_id` on each call
+            memory: Token-budgeted conversation history for the default session
+            turn_stats: Prompt-token counts recorded for recent turns
         """
 
         self.model = model
         self.chatbot_name = chatbot_name
         self.default_system_prompt = default_system_prompt
-        self.conversation_history = []
+        self.memory = ConversationMemory(
+            model=model,
+            max_tokens=history_max_tokens,
+            summarizer=self._summarize_turns if summarize_history else None,
+        )
+        self.turn_stats = deque(maxlen=TURN_STATS_LIMIT)
+        self.turns_recorded = 0
+        self.cache = cache
+        self.last_usage = None
+        self.session_manager = session_manager
+        if session_manager is not None and summarize_history and session_manager.summarizer is None:
+            session_manager.summarizer = self._summarize_turns
         
         # Determine provider based on model name
         if model.startswith("gpt-"):
@@ -33,14 +64,17 @@ class LLMApp:
             if not self.api_key:
                 raise ValueError("OpenAI API key must be provided or set in `OPENAI_API_KEY` environment variable")
             self.client = OpenAI(api_key=self.api_key)
+            self.async_client = AsyncOpenAI(api_key=self.api_key)
         else:
             self.provider = "groq"
             self.api_key = api_key or env_config.groq_api_key
             if not self.api_key:
                 raise ValueError("Groq API key must be provided or set in `GROQ_API_KEY` environment variable")
             self.client = Groq(api_key=self.api_key)
+            self.async_client = AsyncGroq(api_key=self.api_key)
 
-    def chat(self, user_message, system_prompt=None, temperature=0.5, max_tokens=1024):
+    def chat(self, user_message, system_prompt=None, temperature=0.5, max_tokens=1024, use_cache=True,
+             session_id=None):
         """
         Send a message and get a response
         
@@ -49,10 +83,48 @@ class LLMApp:
             system_prompt: Optional system prompt to set context
             temperature: Sampling temperature (0-2)
             max_tokens: Maximum tokens in response
+            use_cache: Set to False to always sample a fresh response (e.g. temperature > 0)
+            session_id: Conversation to continue (requires a session manager)
             
         Returns:
             The assistant's response text
         """
+        # The session stays resident until its history is updated
+        with self._memory(session_id) as memory:
+            messages = self._build_messages(user_message, system_prompt, memory)
+
+            cache_key = self._cache_key(messages, temperature, max_tokens, use_cache)
+            assistant_message = self.cache.get(cache_key) if cache_key else None
+            response = None
+
+            if assistant_message is None:
+                response = self._create_completion(messages, temperature, max_tokens)
+
+                # Extract response text
+                assistant_message = response.choices[0].message.content
+                if cache_key and assistant_message is not None:
+                    self.cache.set(cache_key, assistant_message)
+
+            self._record_turn(messages, response, memory, session_id)
+
+            # Update conversation history (trims back under the token budget)
+            memory.add_exchange(user_message, assistant_message)
+
+        return assistant_message
+
+    @contextmanager
+    def _memory(self, session_id=None):
+        """Yield the history for a session (the instance's own history by default), pinned while in use"""
+        if session_id is None:
+            yield self.memory
+            return
+        if self.session_manager is None:
+            raise ValueError("session_id requires LLMApp to be created with a session_manager")
+        with self.session_manager.lease(session_id) as memory:
+            yield memory
+
+    def _build_messages(self, user_message, system_prompt=None, memory=None):
+        """Build the full messages list: persona system prompt, history (if any), then the user's message"""
         messages = []
 
         # Build complete system prompt combining chatbot name with system prompt
@@ -71,9 +143,9 @@ class LLMApp:
             }
         )
 
-        # Add conversation history
-        if self.conversation_history:
-            messages.extend(self.conversation_history)
+        # Add conversation history (rolling summary + budgeted window)
+        if memory is not None:
+            messages.extend(memory.messages())
         
         # Add current user's message
         messages.append(
@@ -83,43 +155,201 @@ class LLMApp:
             }
         )
 
-        # Make LLM call based on provider
+        return messages
+
+    def stream_once(self, user_message, system_prompt=None, temperature=0.5, max_tokens=1024):
+        """
+        Stream a single response without reading or updating the conversation history
+
+        Provider-reported token usage (if any) is stored in `self.last_usage`
+        once the stream finishes.
+
+        Args:
+            user_message: The user's message
+            system_prompt: Optional system prompt to set context
+            temperature: Sampling temperature (0-2)
+            max_tokens: Maximum tokens in response
+
+        Yields:
+            Response text deltas as they arrive
+        """
+        messages = self._build_messages(user_message, system_prompt)
+        kwargs = self._completion_kwargs(messages, temperature, max_tokens)
+        kwargs["stream"] = True
         if self.provider == "openai":
-            # For GPT-5 models, use max_completion_tokens
-            if self.model.startswith("gpt-5"):
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    temperature=temperature,
-                    max_completion_tokens=max_tokens,
-                )
-            else:
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    temperature=temperature,
-                    max_tokens=max_tokens,
-                )
+            # OpenAI only reports usage on a stream when asked to
+            kwargs["stream_options"] = {"include_usage": True}
+
+        self.last_usage = None
+        for chunk in self.client.chat.completions.create(**kwargs):
+            # OpenAI puts usage on the final chunk, Groq under x_groq
+            usage = getattr(chunk, "usage", None) or getattr(getattr(chunk, "x_groq", None), "usage", None)
+            if usage:
+                self.last_usage = usage
+            if chunk.choices:
+                content = chunk.choices[0].delta.content
+                if content:
+                    yield content
+
+    def _cache_key(self, messages, temperature, max_tokens, use_cache):
+        """Return the cache key for this request, or None when caching is off"""
+        if self.cache is None or not use_cache:
+            return None
+        return make_cache_key(self.model, messages, temperature, max_tokens)
+
+    def _completion_kwargs(self, messages, temperature, max_tokens):
+        """Build request arguments, handling per-provider parameter names"""
+        kwargs = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+        }
+        # For GPT-5 models, use max_completion_tokens
+        if self.provider == "openai" and self.model.startswith("gpt-5"):
+            kwargs["max_completion_tokens"] = max_tokens
         else:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens,
-            )
+            kwargs["max_tokens"] = max_tokens
+        return kwargs
+
+    def _create_completion(self, messages, temperature, max_tokens):
+        """Make the LLM call based on provider"""
+        return self.client.chat.completions.create(**self._completion_kwargs(messages, temperature, max_tokens))
+
+    async def _acreate_completion(self, messages, temperature, max_tokens):
+        """Make the LLM call on the async client"""
+        return await self.async_client.chat.completions.create(
+            **self._completion_kwargs(messages, temperature, max_tokens)
+        )
+
+    async def achat(self, user_message, system_prompt=None, temperature=0.5, max_tokens=1024, use_cache=True,
+                    session_id=None):
+        """
+        Async version of `chat` using the provider's async client
 
-        # Extract response text
-        assistant_message = response.choices[0].message.content
+        Args:
+            user_message: The user's message
+            system_prompt: Optional system prompt to set context
+            temperature: Sampling temperature (0-2)
+            max_tokens: Maximum tokens in response
+            use_cache: Set to False to always sample a fresh response (e.g. temperature > 0)
+            session_id: Conversation to continue (requires a session manager)
+
+        Returns:
+            The assistant's response text
+        """
+        with self._memory(session_id) as memory:
+            messages = self._build_messages(user_message, system_prompt, memory)
+
+            cache_key = self._cache_key(messages, temperature, max_tokens, use_cache)
+            assistant_message = self.cache.get(cache_key) if cache_key else None
+            response = None
+
+            if assistant_message is None:
+                response = await self._acreate_completion(messages, temperature, max_tokens)
+                assistant_message = response.choices[0].message.content
+                if cache_key and assistant_message is not None:
+                    self.cache.set(cache_key, assistant_message)
+
+            self._record_turn(messages, response, memory, session_id)
 
-        # Update conversation history
-        self.conversation_history.append({"role": "user", "content": user_message})
-        self.conversation_history.append({"role": "assistant", "content": assistant_message})
+            # Summarizing evicted turns is a blocking call, keep it off the event loop
+            if memory.summarizer:
+                await asyncio.to_thread(memory.add_exchange, user_message, assistant_message)
+            else:
+                memory.add_exchange(user_message, assistant_message)
 
         return assistant_message
+
+    async def chat_many(self, prompts, system_prompt=None, temperature=0.5, max_tokens=1024,
+                        concurrency=16, return_exceptions=False, use_cache=True):
+        """
+        Send many independent prompts concurrently
+
+        Each prompt is sent on its own (no conversation history is read or
+        written), with at most `concurrency` requests in flight at once.
+
+        Args:
+            prompts: List of user messages
+            system_prompt: Optional system prompt applied to every prompt
+            temperature: Sampling temperature (0-2)
+            max_tokens: Maximum tokens in each response
+            concurrency: Maximum number of in-flight requests
+            return_exceptions: Return failed prompts' exceptions in place of
+                               their responses instead of raising the first one
+            use_cache: Set to False to always sample fresh responses
+
+        Returns:
+            List of response texts in the same order as `prompts`
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _one(prompt):
+            async with semaphore:
+                messages = self._build_messages(prompt, system_prompt)
+                cache_key = self._cache_key(messages, temperature, max_tokens, use_cache)
+                cached = self.cache.get(cache_key) if cache_key else None
+                if cached is not None:
+                    return cached
+
+                response = await self._acreate_completion(messages, temperature, max_tokens)
+                answer = response.choices[0].message.content
+                if cache_key and answer is not None:
+                    self.cache.set(cache_key, answer)
+                return answer
+
+        # gather preserves input order regardless of completion order
+        return await asyncio.gather(*(_one(p) for p in prompts), return_exceptions=return_exceptions)
+
+    def _record_turn(self, messages, response, memory, session_id=None):
+        """Record estimated and provider-reported prompt tokens for this turn (response is None on a cache hit)"""
+        usage = getattr(response, "usage", None)
+        self.turns_recorded += 1
+        self.turn_stats.append(
+            {
+                "turn": self.turns_recorded,
+                "session_id": session_id,
+                "prompt_tokens_estimated": count_message_tokens(messages, memory.token_counter),
+                "prompt_tokens": getattr(usage, "prompt_tokens", None),
+                "history_tokens": memory.token_count(),
+                "history_budget": memory.max_tokens,
+                "evicted_turns": memory.evicted_turns,
+                "cached": response is None,
+            }
+        )
+
+    def _summarize_turns(self, previous_summary, evicted):
+        """Fold evicted turns into the rolling summary with a short LLM call"""
+        transcript = "\n".join(f"{m.role}: {m.content}" for m in evicted)
+        if previous_summary:
+            transcript = f"Earlier summary: {previous_summary}\n{transcript}"
+        messages = [
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": transcript},
+        ]
+        try:
+            response = self._create_completion(messages, temperature=0.0, max_tokens=256)
+        except Exception:
+            # Summaries are best effort: keep the previous one if the call fails
+            return previous_summary
+        return (response.choices[0].message.content or "").strip()
+
+    @property
+    def conversation_history(self):
+        """Messages currently retained in the history window"""
+        return [m.as_dict() for m in self.memory.turns]
+
+    @property
+    def prompt_token_counts(self):
+        """Estimated prompt tokens sent on each turn, in order"""
+        return [stat["prompt_tokens_estimated"] for stat in self.turn_stats]
     
     def clear_history(self):
         """Clear the conversation history"""
-        self.conversation_history = []
+        self.memory.clear()
+        self.turn_stats.clear()
+        self.turns_recorded = 0
     
     def get_history(self):
         """Get the current conversation history"""
@@ -0,0 +1,166 @@
+"""
+Token-budgeted conversation memory for LLMApp
+Keeps the resent history bounded by trimming old turns and optionally
+folding them into a rolling summary
+"""
+import sys
+
+# History budgets (in tokens) per model. These leave headroom below each
+# model's context window for the system prompt, the new message and the reply.
+MODEL_HISTORY_BUDGETS = {
+    "llama-3.1-8b-instant": 4000,
+    "llama-3.3-70b-versatile": 8000,
+    "openai/gpt-oss-20b": 8000,
+    "openai/gpt-oss-120b": 8000,
+    "gpt-5": 16000,
+    "gpt-5-mini": 16000,
+    "gpt-5-nano": 8000,
+}
+DEFAULT_HISTORY_BUDGET = 4000
+
+# Per-message overhead used by chat formats (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+try:
+    import tiktoken
+
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken missing or encoding not downloadable
+    _encoding = None
+
+
+def count_tokens(text):
+    """
+    Count tokens in a string
+
+    Uses tiktoken's cl100k_base encoding when available, otherwise falls back
+    to the ~4 characters per token rule of thumb.
+    """
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return max(1, len(text) // 4)
+
+
+def count_message_tokens(messages, token_counter=count_tokens):
+    """Count tokens for a list of chat messages (dicts with role/content)"""
+    return sum(token_counter(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+class Message:
+    """Compact chat message record: interned role, content and its cached token count"""
+
+    __slots__ = ("role", "content", "tokens")
+
+    def __init__(self, role, content, tokens=None, token_counter=count_tokens):
+        self.role = sys.intern(role)
+        self.content = content
+        self.tokens = token_counter(content) if tokens is None else tokens
+
+    def as_dict(self):
+        return {"role": self.role, "content": self.content}
+
+    def __repr__(self):
+        return f"Message(role={self.role!r}, content={self.content!r})"
+
+
+class ConversationMemory:
+
+    def __init__(self, model=None, max_tokens=None, summarizer=None, token_counter=count_tokens):
+        """
+        Initialize the conversation memory
+
+        Args:
+            model: Model name used to look up the default history budget
+            max_tokens: History token budget (overrides the per-model default)
+            summarizer: Optional callable(previous_summary, evicted_messages) -> str
+                        used to fold evicted turns into a rolling summary
+            token_counter: Callable(text) -> int used for all token counts
+        """
+        if max_tokens is None:
+            max_tokens = MODEL_HISTORY_BUDGETS.get(model, DEFAULT_HISTORY_BUDGET)
+        if max_tokens <= 0:
+            raise ValueError("max_tokens must be a positive number of tokens")
+
+        self.max_tokens = max_tokens
+        self.summarizer = summarizer
+        self.token_counter = token_counter
+        self.turns = []
+        self.summary = ""
+        self.evicted_turns = 0
+
+    def _message(self, role, content):
+        return Message(role, content, token_counter=self.token_counter)
+
+    def add(self, role, content):
+        """Append a message and trim the window back under the budget"""
+        self.turns.append(self._message(role, content))
+        self.trim()
+
+    def add_exchange(self, user_message, assistant_message):
+        """Append a user/assistant pair as one turn"""
+        self.turns.append(self._message("user", user_message))
+        self.turns.append(self._message("assistant", assistant_message))
+        self.trim()
+
+    def summary_message(self):
+        """Return the rolling summary as a system message (or None)"""
+        if not self.summary:
+            return None
+        return {
+            "role": "system",
+            "content": f"Summary of the earlier conversation: {self.summary}"
+        }
+
+    def messages(self):
+        """Return the messages to resend: rolling summary first, then the window"""
+        summary = self.summary_message()
+        return ([summary] if summary else []) + [m.as_dict() for m in self.turns]
+
+    def token_count(self):
+        """Tokens currently held by the summary and the retained turns"""
+        summary = self.summary_message()
+        total = count_message_tokens([summary], self.token_counter) if summary else 0
+        return total + sum(m.tokens + MESSAGE_OVERHEAD_TOKENS for m in self.turns)
+
+    def trim(self):
+        """
+        Evict the oldest turns until the history fits the token budget
+
+        Turns are evicted in user/assistant pairs so the window never starts
+        with an orphaned assistant reply. The most recent pair is always kept.
+
+        Returns:
+            The list of evicted Message records
+        """
+        evicted = []
+        total = self.token_count()
+        while len(self.turns) > 2 and total > self.max_tokens:
+            total -= sum(m.tokens + MESSAGE_OVERHEAD_TOKENS for m in self.turns[:2])
+            evicted.extend(self.turns[:2])
+            del self.turns[:2]
+
+        if evicted:
+            self.evicted_turns += len(evicted) // 2
+            if self.summarizer:
+                self.summary = self.summarizer(self.summary, evicted) or self.summary
+                self._trim_summary()
+        return evicted
+
+    def _trim_summary(self):
+        """Keep the rolling summary from eating the whole budget"""
+        limit = self.max_tokens // 4
+        if self.token_counter(self.summary) <= limit:
+            return
+        # Keep the most recent part of the summary, cut on a word boundary
+        words = self.summary.split()
+        while words and self.token_counter(" ".join(words)) > limit:
+            words = words[len(words) // 8 or 1:]
+        self.summary = " ".join(words)
+
+    def clear(self):
+        """Drop all turns and the rolling summary"""
+        self.turns = []
+        self.summary = ""
+        self.evicted_turns = 0
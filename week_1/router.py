@@ -0,0 +1,225 @@
+"""
+Difficulty-based model cascade for LLMApp
+Sends each prompt to the cheapest model that is likely to handle it and
+escalates to larger models upfront (hard prompts) or after a low-confidence answer
+"""
+import re
+import statistics
+import time
+from collections import deque
+
+from main import LLMApp, TURN_STATS_LIMIT
+from memory import ConversationMemory
+
+# Ordered from cheapest/fastest to most capable
+DEFAULT_TIERS = ["llama-3.1-8b-instant", "llama-3.3-70b-versatile", "gpt-5-mini"]
+
+# Difficulty score at which a prompt starts on tier 1, tier 2, ...
+DEFAULT_THRESHOLDS = [0.35, 0.7]
+
+HARD_PATTERNS = [
+    r"\bwhy\b", r"\bexplain\b", r"\bcompare\b", r"\bprove\b", r"\bderive\b",
+    r"\banaly[sz]e\b", r"\bstep[- ]by[- ]step\b", r"\btrade-?offs?\b",
+    r"\bdesign\b", r"\barchitecture\b", r"\boptimi[sz]e\b", r"\bdebug\b",
+    r"\bimplement\b", r"\bwrite (?:a|an|the) (?:function|class|program|script|essay)\b",
+]
+EASY_PATTERNS = [
+    r"^\s*(?:hi|hello|hey|thanks|thank you)\b", r"^\s*what is\b", r"^\s*who is\b",
+    r"^\s*when (?:is|was|did)\b", r"^\s*define\b", r"\btranslate\b",
+]
+LOW_CONFIDENCE_PATTERNS = [
+    r"\bi(?:'m| am) not (?:sure|certain)\b", r"\bi don'?t know\b", r"\bi cannot\b",
+    r"\bi can'?t (?:help|answer|determine)\b", r"\bunable to\b", r"\bit depends\b",
+    r"\bas an ai\b", r"\bi do not have (?:enough )?information\b",
+]
+
+
+def estimate_difficulty(prompt):
+    """
+    Score how hard a prompt looks, from 0.0 (trivial) to 1.0 (hard)
+
+    A cheap local heuristic: prompt length, reasoning/coding keywords,
+    code or math content and the number of questions asked.
+    """
+    text = prompt.lower()
+    score = min(len(prompt) / 1200, 0.4)
+    score += 0.15 * min(sum(bool(re.search(p, text)) for p in HARD_PATTERNS), 3)
+    if "```" in prompt or re.search(r"\bdef |\bclass |;\s*$|=>|\{\s*$", prompt, re.MULTILINE):
+        score += 0.2
+    if re.search(r"[=^∑∫√]|\d+\s*[*/^]\s*\d+", prompt):
+        score += 0.1
+    score += 0.05 * max(prompt.count("?") - 1, 0)
+    if any(re.search(p, text) for p in EASY_PATTERNS):
+        score -= 0.15
+    return max(0.0, min(score, 1.0))
+
+
+def low_confidence_reason(answer, finish_reason=None):
+    """Return why an answer looks unreliable, or None if it looks fine"""
+    if not answer or not answer.strip():
+        return "empty answer"
+    if finish_reason == "length":
+        return "truncated answer"
+    text = answer.lower()
+    for pattern in LOW_CONFIDENCE_PATTERNS:
+        if re.search(pattern, text):
+            return "hedged answer"
+    return None
+
+
+class ModelCascade:
+
+    def __init__(self, tiers=None, thresholds=None, mode="both", groq_api_key=None, openai_api_key=None,
+                 chatbot_name="Thoth", default_system_prompt=None, history_max_tokens=None, cache=None):
+        """
+        Initialize the model cascade
+
+        Args:
+            tiers: Model names ordered from cheapest to most capable
+            thresholds: Difficulty scores at which a prompt starts on tier 1, 2, ...
+            mode: "upfront" (route by difficulty), "confidence" (escalate on a
+                  low-confidence answer) or "both"
+            groq_api_key: Groq API key for Groq-hosted tiers (falls back to env)
+            openai_api_key: OpenAI API key for gpt-* tiers (falls back to env)
+            chatbot_name: Name/identity for the chatbot
+            default_system_prompt: Default system prompt if user doesn't provide one
+            history_max_tokens: Token budget for the shared history (default: smallest tier's budget)
+            cache: Optional response cache shared by every tier
+            decisions: Routing decisions for the last TURN_STATS_LIMIT prompts
+            tier_latencies: Last TURN_STATS_LIMIT call latencies (seconds) per model
+        """
+        self.tiers = list(tiers or DEFAULT_TIERS)
+        self.thresholds = list(thresholds if thresholds is not None else DEFAULT_THRESHOLDS)
+        if mode not in ("upfront", "confidence", "both"):
+            raise ValueError("mode must be 'upfront', 'confidence' or 'both'")
+        if len(self.thresholds) != len(self.tiers) - 1:
+            raise ValueError("thresholds needs exactly one entry per tier after the first")
+
+        self.mode = mode
+        self.groq_api_key = groq_api_key
+        self.openai_api_key = openai_api_key
+        self.chatbot_name = chatbot_name
+        self.default_system_prompt = default_system_prompt
+        self.cache = cache
+
+        # Every tier shares one history so escalation never loses context;
+        # the budget must fit the smallest model in the cascade
+        self.memory = ConversationMemory(model=self.tiers[0], max_tokens=history_max_tokens)
+        self.turn_stats = deque(maxlen=TURN_STATS_LIMIT)
+        self.decisions = deque(maxlen=TURN_STATS_LIMIT)
+        self.tier_latencies = {model: deque(maxlen=TURN_STATS_LIMIT) for model in self.tiers}
+        self.turns_recorded = 0
+        self._apps = {}
+
+    @property
+    def model(self):
+        """Model that answered the last prompt"""
+        return self.decisions[-1]["final_model"] if self.decisions else self.tiers[0]
+
+    def _app(self, model):
+        """Create (once) the LLMApp for a tier, wired to the shared history"""
+        if model not in self._apps:
+            api_key = self.openai_api_key if model.startswith("gpt-") else self.groq_api_key
+            app = LLMApp(
+                api_key=api_key,
+                model=model,
+                chatbot_name=self.chatbot_name,
+                default_system_prompt=self.default_system_prompt,
+                cache=self.cache,
+            )
+            app.memory = self.memory
+            app.turn_stats = self.turn_stats
+            self._apps[model] = app
+        return self._apps[model]
+
+    def start_tier(self, difficulty):
+        """Index of the first tier to try for a given difficulty"""
+        if self.mode == "confidence":
+            return 0
+        return sum(difficulty >= t for t in self.thresholds)
+
+    def chat(self, user_message, system_prompt=None, temperature=0.5, max_tokens=1024, use_cache=True):
+        """
+        Route a message through the cascade and return the accepted answer
+
+        Args:
+            user_message: The user's message
+            system_prompt: Optional system prompt to set context
+            temperature: Sampling temperature (0-2)
+            max_tokens: Maximum tokens in response
+            use_cache: Set to False to always sample a fresh response
+
+        Returns:
+            The assistant's response text
+        """
+        difficulty = estimate_difficulty(user_message)
+        tier = self.start_tier(difficulty)
+        decision = {
+            "prompt_chars": len(user_message),
+            "difficulty": round(difficulty, 3),
+            "start_model": self.tiers[tier],
+            "attempts": [],
+        }
+
+        while True:
+            model = self.tiers[tier]
+            app = self._app(model)
+            messages = app._build_messages(user_message, system_prompt, self.memory)
+            cache_key = app._cache_key(messages, temperature, max_tokens, use_cache)
+            answer = self.cache.get(cache_key) if cache_key else None
+            response, finish_reason = None, None
+
+            started = time.perf_counter()
+            if answer is None:
+                response = app._create_completion(messages, temperature, max_tokens)
+                answer = response.choices[0].message.content
+                finish_reason = response.choices[0].finish_reason
+            latency = time.perf_counter() - started
+            if response is not None:
+                # Cache hits would skew the per-tier latency numbers
+                self.tier_latencies[model].append(latency)
+
+            reason = None
+            if self.mode != "upfront" and tier < len(self.tiers) - 1:
+                reason = low_confidence_reason(answer, finish_reason)
+            decision["attempts"].append(
+                {"model": model, "latency": round(latency, 4), "cached": response is None, "escalated": reason}
+            )
+
+            if reason is None:
+                break
+            tier += 1
+
+        # Only answers we accept are cached and enter the shared history
+        if cache_key and response is not None:
+            self.cache.set(cache_key, answer)
+        app._record_turn(messages, response, self.memory)
+        # Each tier's app counts its own turns; number them by cascade turn instead
+        self.turns_recorded += 1
+        self.turn_stats[-1].update(turn=self.turns_recorded, model=model)
+        self.memory.add_exchange(user_message, answer)
+
+        decision["final_model"] = model
+        decision["total_latency"] = round(sum(a["latency"] for a in decision["attempts"]), 4)
+        self.decisions.append(decision)
+        return answer
+
+    def latency_summary(self):
+        """Median and call count per tier, from the recorded latencies"""
+        return {
+            model: {
+                "calls": len(latencies),
+                "median_latency": statistics.median(latencies) if latencies else None,
+            }
+            for model, latencies in self.tier_latencies.items()
+        }
+
+    def clear_history(self):
+        """Clear the shared conversation history"""
+        self.memory.clear()
+        self.turn_stats.clear()
+        self.turns_recorded = 0
+
+    def get_history(self):
+        """Get the current conversation history"""
+        return [m.as_dict() for m in self.memory.turns]
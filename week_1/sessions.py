@@ -0,0 +1,245 @@
+"""
+Multi-session conversation manager for LLMApp
+Holds many conversations keyed by session id, spills idle ones to an
+append-only log on disk and lazily reloads them on next access
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from memory import ConversationMemory, Message
+
+# Spilled sessions are indexed by a single packed int: offset << LENGTH_BITS | length
+LENGTH_BITS = 32
+LENGTH_MASK = (1 << LENGTH_BITS) - 1
+
+
+class _Session:
+    """Resident session: its memory, when it was last used and how many callers hold it"""
+
+    __slots__ = ("memory", "last_access", "pins")
+
+    def __init__(self, memory, last_access):
+        self.memory = memory
+        self.last_access = last_access
+        self.pins = 0
+
+
+class SessionManager:
+
+    def __init__(self, spill_dir=".sessions", idle_seconds=600, max_resident=1000, model=None,
+                 history_max_tokens=None, summarizer=None, sweep_seconds=60):
+        """
+        Initialize the session manager
+
+        Args:
+            spill_dir: Directory holding the append-only spill log
+            idle_seconds: Sessions unused for this long are spilled by `spill_idle`
+            max_resident: Maximum sessions kept in memory; the least recently
+                          used ones are spilled when it is exceeded
+            model: Model name used for the per-session history budget
+            history_max_tokens: Token budget for each session's history
+            summarizer: Optional summarizer passed to every session's memory
+            sweep_seconds: `get` runs `spill_idle` at most this often
+        """
+        if max_resident < 1:
+            raise ValueError("max_resident must be at least 1")
+
+        self.idle_seconds = idle_seconds
+        self.max_resident = max_resident
+        self.model = model
+        self.history_max_tokens = history_max_tokens
+        self.summarizer = summarizer
+        self.sweep_seconds = sweep_seconds
+        self._last_sweep = time.monotonic()
+
+        os.makedirs(spill_dir, exist_ok=True)
+        self.log_path = os.path.join(spill_dir, "sessions.log")
+        self._resident = {}  # session_id -> _Session
+        self._spilled = {}   # session_id -> packed (offset, length) in the log
+        self._live_bytes = 0
+        self._lock = threading.RLock()
+        self.stats = {"spills": 0, "reloads": 0, "compactions": 0}
+
+        # Rebuild the index from an existing log so spilled sessions survive restarts
+        if os.path.exists(self.log_path):
+            self._reindex()
+
+    def _new_memory(self):
+        return ConversationMemory(
+            model=self.model,
+            max_tokens=self.history_max_tokens,
+            summarizer=self.summarizer,
+        )
+
+    def get(self, session_id):
+        """
+        Return the session's memory, reloading it from disk or creating it if needed
+
+        The memory may be spilled by a later call; use `lease` to keep it
+        resident while it is being updated (e.g. across an LLM call).
+        """
+        with self._lock:
+            return self._acquire(session_id).memory
+
+    @contextmanager
+    def lease(self, session_id):
+        """Pin the session in memory for the duration of the block and yield its memory"""
+        with self._lock:
+            session = self._acquire(session_id, pin=True)
+        try:
+            yield session.memory
+        finally:
+            with self._lock:
+                session.pins -= 1
+                session.last_access = time.monotonic()
+
+    def _acquire(self, session_id, pin=False):
+        now = time.monotonic()
+        session = self._resident.get(session_id)
+        if session is None:
+            memory = self._reload(session_id) if session_id in self._spilled else self._new_memory()
+            session = self._resident[session_id] = _Session(memory, now)
+        session.last_access = now
+        session.pins += pin
+        if len(self._resident) > self.max_resident:
+            self._spill_lru(keep=session_id)
+        if now - self._last_sweep >= self.sweep_seconds:
+            self.spill_idle(now)
+        return session
+
+    def drop(self, session_id):
+        """Forget a session entirely (its old log record is reclaimed on compaction)"""
+        with self._lock:
+            self._resident.pop(session_id, None)
+            packed = self._spilled.pop(session_id, None)
+            if packed is not None:
+                self._live_bytes -= packed & LENGTH_MASK
+
+    def spill_idle(self, now=None):
+        """
+        Spill every unpinned session idle for longer than `idle_seconds`
+
+        Returns:
+            The number of sessions written to disk
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._last_sweep = now
+            idle = [sid for sid, s in self._resident.items()
+                    if not s.pins and now - s.last_access > self.idle_seconds]
+            for session_id in idle:
+                self._spill(session_id)
+            self._maybe_compact()
+            return len(idle)
+
+    def _spill_lru(self, keep=None):
+        # Pinned sessions are in use; if all are, stay over max_resident until one is released
+        unpinned = [sid for sid, s in self._resident.items() if not s.pins and sid != keep]
+        if not unpinned:
+            return
+        session_id = min(unpinned, key=lambda sid: self._resident[sid].last_access)
+        self._spill(session_id)
+        self._maybe_compact()
+
+    def _spill(self, session_id):
+        """Append the session to the log and keep only its packed location in memory"""
+        memory = self._resident.pop(session_id).memory
+        record = {
+            "id": session_id,
+            "summary": memory.summary,
+            "evicted": memory.evicted_turns,
+            "turns": [[m.role, m.content, m.tokens] for m in memory.turns],
+        }
+        line = (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        with open(self.log_path, "ab") as f:
+            offset = f.tell()
+            f.write(line)
+
+        previous = self._spilled.get(session_id)
+        if previous is not None:
+            self._live_bytes -= previous & LENGTH_MASK
+        self._spilled[session_id] = (offset << LENGTH_BITS) | len(line)
+        self._live_bytes += len(line)
+        self.stats["spills"] += 1
+
+    def _read_record(self, packed):
+        offset, length = packed >> LENGTH_BITS, packed & LENGTH_MASK
+        with open(self.log_path, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.read(length))
+
+    def _reload(self, session_id):
+        packed = self._spilled.pop(session_id)
+        self._live_bytes -= packed & LENGTH_MASK
+        record = self._read_record(packed)
+
+        memory = self._new_memory()
+        memory.summary = record["summary"]
+        memory.evicted_turns = record["evicted"]
+        memory.turns = [Message(role, content, tokens) for role, content, tokens in record["turns"]]
+        self.stats["reloads"] += 1
+        return memory
+
+    def _reindex(self):
+        """Scan the log; the last record for each session wins"""
+        offset = 0
+        with open(self.log_path, "rb") as f:
+            for line in f:
+                try:
+                    session_id = json.loads(line)["id"]
+                except ValueError:
+                    # Torn write from a crash: skip the partial record
+                    offset += len(line)
+                    continue
+                previous = self._spilled.get(session_id)
+                if previous is not None:
+                    self._live_bytes -= previous & LENGTH_MASK
+                self._spilled[session_id] = (offset << LENGTH_BITS) | len(line)
+                self._live_bytes += len(line)
+                offset += len(line)
+
+    def _maybe_compact(self):
+        """Rewrite the log once stale records take up more than half of it"""
+        try:
+            size = os.path.getsize(self.log_path)
+        except OSError:
+            return
+        if size > 1_000_000 and self._live_bytes < size // 2:
+            self.compact()
+
+    def compact(self):
+        """Rewrite the log keeping only the latest record of each spilled session"""
+        with self._lock:
+            tmp_path = self.log_path + ".tmp"
+            spilled = {}
+            with open(self.log_path, "rb") as src, open(tmp_path, "wb") as dst:
+                for session_id, packed in self._spilled.items():
+                    src.seek(packed >> LENGTH_BITS)
+                    line = src.read(packed & LENGTH_MASK)
+                    spilled[session_id] = (dst.tell() << LENGTH_BITS) | len(line)
+                    dst.write(line)
+            os.replace(tmp_path, self.log_path)
+            self._spilled = spilled
+            self.stats["compactions"] += 1
+
+    def __contains__(self, session_id):
+        with self._lock:
+            return session_id in self._resident or session_id in self._spilled
+
+    def __len__(self):
+        with self._lock:
+            return len(self._resident) + len(self._spilled)
+
+    def summary(self):
+        """Resident/spilled session counts and log size"""
+        with self._lock:
+            return {
+                "resident": len(self._resident),
+                "spilled": len(self._spilled),
+                "log_bytes": os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0,
+                "live_log_bytes": self._live_bytes,
+                **self.stats,
+            }
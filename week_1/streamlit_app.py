@@ -4,8 +4,23 @@ Supports both Groq (Llama) and OpenAI (GPT-5) models with automatic provider swi
 """
 import streamlit as st
 from main import LLMApp
+from cache import ResponseCache
+from router import ModelCascade
+from benchmark import run_arena, results_to_csv
+from renderer import BufferedStreamRenderer
 import os
 
+CASCADE_MODEL = "auto (cascade)"
+MODEL_OPTIONS = [
+    "llama-3.1-8b-instant",
+    "llama-3.3-70b-versatile",
+    "openai/gpt-oss-120b",
+    "openai/gpt-oss-120b",
+    "gpt-5",
+    "gpt-5-mini",
+    "gpt-5-nano",
+]
+
 # Page configuration
 st.set_page_config(
     page_title="Simple LLM Chat Application (Groq + OpenAI)",
@@ -20,6 +35,10 @@ if "llm_app" not in st.session_state:
     st.session_state.llm_app = None
 if "last_config" not in st.session_state:
     st.session_state.last_config = {}
+if "response_cache" not in st.session_state:
+    st.session_state.response_cache = ResponseCache(max_entries=512, ttl=3600)
+if "arena_results" not in st.session_state:
+    st.session_state.arena_results = []
 
 # Title and description
 st.title("🤖 Groq + OpenAI LLM Chat Application")
@@ -55,21 +74,29 @@ with st.sidebar:
         openai_api_key = os.getenv("OPENAI_API_KEY", "")
 
     st.divider()
+
+    mode = st.radio(
+        "Mode",
+        ["Chat", "Arena"],
+        horizontal=True,
+        help="Arena sends the same prompt to several models at once and benchmarks them"
+    )
     
     # Model selection
-    model = st.selectbox(
-        "Model",
-        [
-            "llama-3.1-8b-instant",
-            "llama-3.3-70b-versatile",
-            "openai/gpt-oss-120b",
-            "openai/gpt-oss-120b",
-            "gpt-5",
-            "gpt-5-mini",
-            "gpt-5-nano",
-        ],
-        help="Choose your preferred AI model"
-    )
+    if mode == "Arena":
+        arena_models = st.multiselect(
+            "Models to compare",
+            list(dict.fromkeys(MODEL_OPTIONS)),
+            default=["llama-3.1-8b-instant", "llama-3.3-70b-versatile"],
+            help="Each selected model answers the same prompt concurrently"
+        )
+        model = arena_models[0] if arena_models else MODEL_OPTIONS[0]
+    else:
+        model = st.selectbox(
+            "Model",
+            MODEL_OPTIONS + [CASCADE_MODEL],
+            help="Choose your preferred AI model, or let the cascade route each prompt to the cheapest capable model"
+        )
     st.divider()
     
     # Chatbot persona
@@ -106,6 +133,17 @@ with st.sidebar:
         help="Maximum length of the response (uses max_completion_tokens for GPT-5)"
     )
 
+    use_cache = st.checkbox(
+        "Reuse cached answers",
+        value=True,
+        help="Serve repeated prompts (same model, history and settings) from the response cache"
+    )
+    cache_stats = st.session_state.response_cache.stats
+    st.caption(
+        f"Cache: {cache_stats['hits']} hits · {cache_stats['misses']} misses · "
+        f"{cache_stats['evictions']} evictions"
+    )
+
     st.divider()
     
     # Clear chat button
@@ -118,11 +156,87 @@ with st.sidebar:
 
 def _pick_api_key(model_name: str) -> str | None:
     """Return correct API key based on model/provider"""
-    if model_name.startswith("gpt-") or model_name.startswith("openai/"):
+    # Same rule as LLMApp: openai/* models (gpt-oss) are served by Groq
+    if model_name.startswith("gpt-"):
         return openai_api_key or None
     return groq_api_key or None
 
 
+def _render_arena():
+    """Benchmark mode: stream one prompt to every selected model side by side"""
+    st.subheader("🏟️ Model Arena")
+    if not arena_models:
+        st.info("Select at least one model in the sidebar.")
+        return
+
+    arena_prompt = st.text_area("Prompt", placeholder="Ask every selected model the same question...")
+    if st.button("Run benchmark", type="primary") and arena_prompt.strip():
+        apps, failed = [], []
+        for name in arena_models:
+            try:
+                apps.append(LLMApp(
+                    api_key=_pick_api_key(name),
+                    model=name,
+                    chatbot_name=chatbot_name.strip() or "Thoth",
+                    default_system_prompt=system_prompt or None,
+                ))
+            except Exception as e:
+                failed.append(f"{name}: {e}")
+        for message in failed:
+            st.warning(f"⚠️ Skipped {message}")
+
+        columns = st.columns(len(apps)) if apps else []
+        placeholders, stats, renderers = {}, {}, {}
+        for column, app in zip(columns, apps):
+            with column:
+                st.markdown(f"**{app.model}**")
+                placeholders[app.model] = st.empty()
+                stats[app.model] = st.empty()
+                # Re-rendering every column on every token is quadratic; coalesce instead
+                renderers[app.model] = BufferedStreamRenderer(placeholders[app.model])
+
+        for kind, name, payload in run_arena(apps, arena_prompt, system_prompt or None, temperature, max_tokens):
+            if kind == "token":
+                renderers[name].write(payload)
+                continue
+            renderers[name].close()
+            if payload["error"]:
+                placeholders[name].error(f"❌ {payload['error']}")
+            stats[name].caption(
+                f"TTFT {payload['ttft_s'] or '–'}s · total {payload['total_latency_s']}s · "
+                f"{payload['tokens_per_s'] or '–'} tok/s · {payload['output_tokens']} output tokens"
+                f" ({payload['usage_source']})"
+            )
+            st.session_state.arena_results.append(payload)
+
+    if st.session_state.arena_results:
+        st.divider()
+        st.dataframe(
+            [{k: v for k, v in r.items() if k != "response"} for r in st.session_state.arena_results],
+            use_container_width=True,
+        )
+        col_csv, col_reset = st.columns(2)
+        with col_csv:
+            st.download_button(
+                "⬇️ Export CSV",
+                results_to_csv(st.session_state.arena_results),
+                file_name="arena_results.csv",
+                mime="text/csv",
+                use_container_width=True,
+            )
+        with col_reset:
+            if st.button("Reset results", use_container_width=True):
+                st.session_state.arena_results = []
+                st.rerun()
+
+
+if mode == "Arena":
+    _render_arena()
+    st.divider()
+    st.caption("Built with ❤️ using Streamlit, Groq, and OpenAI")
+    st.stop()
+
+
 # Configuration tracking for reinitializing the app
 current_config = {
     "model": model,
@@ -143,12 +257,22 @@ def _needs_reinit(prev: dict, curr: dict) -> bool:
 if _needs_reinit(st.session_state.last_config, current_config) or st.session_state.llm_app is None:
     key = _pick_api_key(model)
     try:
-        st.session_state.llm_app = LLMApp(
-            api_key=key,
-            model=model,
-            chatbot_name=current_config["chatbot_name"] or "Thoth",
-            default_system_prompt=(current_config["system_prompt"] or None),
-        )
+        if model == CASCADE_MODEL:
+            st.session_state.llm_app = ModelCascade(
+                groq_api_key=groq_api_key or None,
+                openai_api_key=openai_api_key or None,
+                chatbot_name=current_config["chatbot_name"] or "Thoth",
+                default_system_prompt=(current_config["system_prompt"] or None),
+                cache=st.session_state.response_cache,
+            )
+        else:
+            st.session_state.llm_app = LLMApp(
+                api_key=key,
+                model=model,
+                chatbot_name=current_config["chatbot_name"] or "Thoth",
+                default_system_prompt=(current_config["system_prompt"] or None),
+                cache=st.session_state.response_cache,
+            )
         st.session_state.last_config = current_config
         # Clear history when changing persona/model to avoid context mixing
         st.session_state.messages = []
@@ -159,7 +283,10 @@ if _needs_reinit(st.session_state.last_config, current_config) or st.session_sta
 
 
 # Display provider and model information
-provider = "OpenAI" if model.startswith("gpt-") else "Groq"
+if model == CASCADE_MODEL:
+    provider = "Groq → OpenAI"
+else:
+    provider = "OpenAI" if model.startswith("gpt-") else "Groq"
 col1, col2 = st.columns(2)
 with col1:
     st.caption(f"**Provider:** {provider}")
@@ -198,10 +325,25 @@ if prompt := st.chat_input("Type your message here..."):
                         user_message=prompt,
                         system_prompt=system_prompt if system_prompt else None,
                         temperature=temperature,
-                        max_tokens=max_tokens
+                        max_tokens=max_tokens,
+                        use_cache=use_cache
                     )
 
                     st.markdown(response)
+
+                    # Show how much context was resent on this turn
+                    last_turn = st.session_state.llm_app.turn_stats[-1]
+                    st.caption(
+                        f"Prompt tokens: {last_turn['prompt_tokens'] or last_turn['prompt_tokens_estimated']}"
+                        f" · History: {last_turn['history_tokens']}/{last_turn['history_budget']} tokens"
+                    )
+                    if model == CASCADE_MODEL:
+                        decision = st.session_state.llm_app.decisions[-1]
+                        route = " → ".join(a["model"] for a in decision["attempts"])
+                        st.caption(
+                            f"Routed: {route} · difficulty {decision['difficulty']}"
+                            f" · {decision['total_latency']:.2f}s"
+                        )
                     
                     # Add assistant response to chat history
                     st.session_state.messages.append({
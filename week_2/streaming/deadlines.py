@@ -0,0 +1,81 @@
+"""
+Helpers for deadline-aware streaming
+Reads an upstream stream on a background thread so the consumer can wait
+on it with timeouts, and finds sentence boundaries for clean early stops
+"""
+import queue
+import re
+import threading
+
+# End of a sentence: terminal punctuation (optionally closed by quotes/brackets) or a newline
+SENTENCE_BOUNDARY = re.compile(r"[.!?…](?:[\"')\]]*)(?=\s|$)|\n")
+SENTENCE_END = re.compile(r"(?:[.!?…][\"')\]]*|\n)\s*$")
+
+
+def sentence_cut(text):
+    """Index just past the first sentence boundary in text, or None"""
+    match = SENTENCE_BOUNDARY.search(text)
+    return match.end() if match else None
+
+
+def ends_sentence(text):
+    """True if text ends on a sentence boundary (ignoring trailing whitespace)"""
+    return bool(SENTENCE_END.search(text))
+
+
+class UpstreamPump:
+
+    def __init__(self, open_stream):
+        """
+        Start reading an upstream stream on a daemon thread
+
+        Args:
+            open_stream: Callable returning an iterable stream of chunks
+                         (opening the connection also happens on the thread)
+        """
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._stream = None
+        self._thread = threading.Thread(target=self._run, args=(open_stream,), daemon=True)
+        self._thread.start()
+
+    def _run(self, open_stream):
+        try:
+            self._stream = open_stream()
+            if self._stop.is_set():
+                self._close_stream()
+                return
+            for chunk in self._stream:
+                if self._stop.is_set():
+                    return
+                self._queue.put(("chunk", chunk))
+            self._queue.put(("end", None))
+        except Exception as e:
+            # Errors caused by close() are expected and not reported
+            if not self._stop.is_set():
+                self._queue.put(("error", e))
+
+    def get(self, timeout=None):
+        """
+        Wait for the next event
+
+        Returns:
+            ("chunk", chunk), ("end", None) or ("error", exception)
+
+        Raises:
+            queue.Empty if nothing arrives within `timeout` seconds
+        """
+        return self._queue.get(timeout=timeout)
+
+    def _close_stream(self):
+        stream = self._stream
+        if stream is not None and hasattr(stream, "close"):
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+    def close(self):
+        """Stop reading and close the upstream connection"""
+        self._stop.set()
+        self._close_stream()
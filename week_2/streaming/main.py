@@ -1,9 +1,15 @@
 """
 Simple LLM Application using Groq API
 """
+import queue
 import time
-from groq import Groq
+from groq import Groq, AsyncGroq
 from appconfig import env_config
+from telemetry import StreamStats, StreamStatsAggregate
+from deadlines import UpstreamPump, sentence_cut, ends_sentence
+
+# Faster model used when the first-token deadline of a deadline-aware stream passes
+FALLBACK_MODEL = "llama-3.1-8b-instant"
 
 class LLMApp:
 
@@ -16,6 +22,8 @@ class LLMApp:
             api_key: Groq API key (if None, reads from GROQ_API_KEY env var)
             model: Model to use for completions
             conversation_history: List of converstaions in a session
+            last_stream_stats: Telemetry of the most recent stream_chat call
+            stream_stats: Telemetry aggregated across stream_chat calls
         """
 
         self.api_key = api_key or env_config.groq_api_key
@@ -23,23 +31,14 @@ class LLMApp:
             raise ValueError("Groq API key must be provided or set in `GROQ_API_KEY` environment variable")
         
         self.client = Groq(api_key=self.api_key)
+        self.async_client = AsyncGroq(api_key=self.api_key)
         self.model = model
         self.conversation_history = []
+        self.last_stream_stats = None
+        self.stream_stats = StreamStatsAggregate()
 
-    def chat(self, user_message, system_prompt=None, temperature=0.5, max_tokens=1024):
-        """
-        Send a message and get a response
-        
-        Args:
-            user_message: The user's message
-            system_prompt: Optional system prompt to set context
-            temperature: Sampling temperature (0-2)
-            max_tokens: Maximum tokens in response
-            
-        Returns:
-            The assistant's response text
-        """
-
+    def _build_messages(self, user_message, system_prompt=None):
+        """Build the messages list: optional system prompt, history, then the user's message"""
         messages = []
 
         # Add system prompt if provided
@@ -63,6 +62,24 @@ class LLMApp:
             }
         )
 
+        return messages
+
+    def chat(self, user_message, system_prompt=None, temperature=0.5, max_tokens=1024):
+        """
+        Send a message and get a response
+        
+        Args:
+            user_message: The user's message
+            system_prompt: Optional system prompt to set context
+            temperature: Sampling temperature (0-2)
+            max_tokens: Maximum tokens in response
+            
+        Returns:
+            The assistant's response text
+        """
+
+        messages = self._build_messages(user_message, system_prompt)
+
         # Make LLM call
         response = self.client.chat.completions.create(
             model=self.model,
@@ -76,7 +93,9 @@ class LLMApp:
 
         return assistant_message
     
-    def stream_chat(self, user_message, system_prompt=None, temperature=0.5, max_tokens=1024):
+    def stream_chat(self, user_message, system_prompt=None, temperature=0.5, max_tokens=1024,
+                    time_budget=None, first_token_deadline=None, fallback_model=FALLBACK_MODEL,
+                    sentence_grace=1.0):
         """
         Send a message and get a response
         
@@ -85,33 +104,30 @@ class LLMApp:
             system_prompt: Optional system prompt to set context
             temperature: Sampling temperature (0-2)
             max_tokens: Maximum tokens in response
+            time_budget: Optional wall-clock budget (seconds) for the whole stream;
+                         once spent, the stream ends at the next sentence boundary
+            first_token_deadline: Optional seconds to wait for the first token
+                                  before switching to `fallback_model`
+            fallback_model: Faster model used when the first-token deadline passes
+            sentence_grace: Extra seconds allowed past `time_budget` to finish the
+                            current sentence before the stream is cut
             
-        Returns:
-            The assistant's response text
+        Yields:
+            Response text as it streams in. Timing telemetry (including which
+            path was taken) is available in `last_stream_stats` once the
+            generator finishes (or is closed)
         """
 
-        messages = []
+        messages = self._build_messages(user_message, system_prompt)
 
-        # Add system prompt if provided
-        if system_prompt:
-            messages.append(
-                {
-                    "role": "system",
-                    "content": f"{system_prompt}"
-                }
-            )
+        stats = StreamStats(self.model)
 
-        # Add conversation history
-        if self.conversation_history:
-            messages.extend(self.conversation_history)
-        
-        # Add current user's message
-        messages.append(
-            {
-                "role": "user",
-                "content": f"{user_message}"
-            }
-        )
+        if time_budget is not None or first_token_deadline is not None:
+            yield from self._stream_with_deadlines(
+                messages, temperature, max_tokens, stats,
+                time_budget, first_token_deadline, fallback_model, sentence_grace,
+            )
+            return
 
         # Make LLM call
         stream = self.client.chat.completions.create(
@@ -122,20 +138,171 @@ class LLMApp:
             stream=True
         )
 
-        full_response = ""
-        # token_count = 0
-
-        # Extract response text
-        for token in stream:
-            content = token.choices[0].delta.content
-            if content:
-                # if token_count==0:
-                #     first_token_time = time.time() - start_time
-                #     token_count += 1 
-                # print(content, end="")
-                full_response += content
-                yield f"{content}"
+        completion_tokens = None
+        try:
+            # Extract response text
+            for token in stream:
+                # Groq reports usage on the final chunk under x_groq
+                usage = getattr(getattr(token, "x_groq", None), "usage", None)
+                if usage is not None:
+                    completion_tokens = getattr(usage, "completion_tokens", None)
+                if not token.choices:
+                    continue
+                content = token.choices[0].delta.content
+                if content:
+                    stats.on_token()
+                    yield f"{content}"
+        finally:
+            # Runs on normal completion and when the consumer closes the generator early
+            if hasattr(stream, "close"):
+                stream.close()
+            stats.finish(completion_tokens)
+            self.last_stream_stats = stats
+            self.stream_stats.add(stats)
     
+    def _stream_with_deadlines(self, messages, temperature, max_tokens, stats,
+                               time_budget, first_token_deadline, fallback_model, sentence_grace):
+        """Deadline-aware body of stream_chat; records the path taken on `stats`"""
+        def open_stream(model):
+            return lambda: self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True
+            )
+
+        budget_end = stats.started_at + time_budget if time_budget is not None else None
+        first_token_end = stats.started_at + first_token_deadline if first_token_deadline is not None else None
+        upstream = UpstreamPump(open_stream(self.model))
+        stats.path = "primary"
+        stats.stop_reason = "closed"
+        emitted_tail = ""
+        completion_tokens = None
+
+        try:
+            while True:
+                # Deadlines are checked on every event, not only on timeouts: content-less
+                # chunks (role or reasoning deltas) can keep the queue busy past them
+                now = time.perf_counter()
+                waiting_first = stats.first_token_at is None and stats.path == "primary" and first_token_end
+                if waiting_first and now >= first_token_end:
+                    if fallback_model and fallback_model != self.model:
+                        # First token is late: drop the primary stream and retry on the faster model
+                        upstream.close()
+                        upstream = UpstreamPump(open_stream(fallback_model))
+                        stats.path = "fallback"
+                        stats.model = fallback_model
+                    # Without a fallback, keep waiting on the total budget
+                    first_token_end = None
+                    continue
+                if budget_end is not None and now >= budget_end + sentence_grace:
+                    stats.stop_reason = "time_budget_hard"
+                    break
+
+                if waiting_first:
+                    timeout = first_token_end - now
+                elif budget_end is not None:
+                    timeout = budget_end + sentence_grace - now
+                else:
+                    timeout = None
+
+                try:
+                    kind, payload = upstream.get(timeout=timeout)
+                except queue.Empty:
+                    continue
+
+                if kind == "error":
+                    raise payload
+                if kind == "end":
+                    stats.stop_reason = "complete"
+                    break
+
+                usage = getattr(getattr(payload, "x_groq", None), "usage", None)
+                if usage is not None:
+                    completion_tokens = getattr(usage, "completion_tokens", None)
+                if not payload.choices:
+                    continue
+                content = payload.choices[0].delta.content
+                if not content:
+                    continue
+
+                now = time.perf_counter()
+                if budget_end is not None and now >= budget_end + sentence_grace:
+                    # Tokens kept arriving but no sentence ended within the grace period
+                    stats.stop_reason = "time_budget_hard"
+                    break
+                over_budget = budget_end is not None and now >= budget_end
+                if over_budget:
+                    if ends_sentence(emitted_tail):
+                        stats.stop_reason = "time_budget"
+                        break
+                    cut = sentence_cut(content)
+                    if cut is not None:
+                        # Finish the current sentence and stop
+                        stats.on_token()
+                        yield content[:cut]
+                        stats.stop_reason = "time_budget"
+                        break
+
+                stats.on_token()
+                emitted_tail = (emitted_tail + content)[-8:]
+                yield content
+        finally:
+            upstream.close()
+            stats.finish(completion_tokens)
+            self.last_stream_stats = stats
+            self.stream_stats.add(stats)
+
+    async def astream_chat(self, user_message, system_prompt=None, temperature=0.5, max_tokens=1024, stats=None):
+        """
+        Async version of `stream_chat` using the async Groq client
+
+        Closing the generator (e.g. when an HTTP client disconnects) closes
+        the upstream stream as well.
+
+        Args:
+            user_message: The user's message
+            system_prompt: Optional system prompt to set context
+            temperature: Sampling temperature (0-2)
+            max_tokens: Maximum tokens in response
+            stats: Optional StreamStats to fill in, for callers running many
+                   concurrent streams where `last_stream_stats` is ambiguous
+
+        Yields:
+            Response text as it streams in. Timing telemetry is available in
+            `last_stream_stats` once the generator finishes (or is closed)
+        """
+        messages = self._build_messages(user_message, system_prompt)
+        stats = stats or StreamStats(self.model)
+
+        stream = await self.async_client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True
+        )
+
+        completion_tokens = None
+        try:
+            async for token in stream:
+                usage = getattr(getattr(token, "x_groq", None), "usage", None)
+                if usage is not None:
+                    completion_tokens = getattr(usage, "completion_tokens", None)
+                if not token.choices:
+                    continue
+                content = token.choices[0].delta.content
+                if content:
+                    stats.on_token()
+                    yield content
+        finally:
+            if hasattr(stream, "close"):
+                await stream.close()
+            stats.finish(completion_tokens)
+            self.last_stream_stats = stats
+            self.stream_stats.add(stats)
+
     # def clear_history(self):
     #     """Clear the conversation history"""
     #     self.conversation_history = []
@@ -153,8 +320,9 @@ if __name__=="__main__":
         message = input(f"What do you want to ask: ")
         start_time = time.time()
         # response = app.chat(message)
-        first_token_time = app.stream_chat(message, start_time=start_time)
+        for content in app.stream_chat(message):
+            print(content, end="", flush=True)
         # print(f"\nAssistant Response: \n{response}\n")
-        # print(f"\nResponse generated in {time.time() - start_time} seconds")
-        print(f"\nFirst token generated in {first_token_time} seconds")
+        print(f"\nResponse generated in {time.time() - start_time} seconds")
+        print(app.last_stream_stats.format())
 
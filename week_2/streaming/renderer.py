@@ -0,0 +1,99 @@
+"""
+Buffered stream renderer for Streamlit placeholders
+Coalesces streamed tokens and re-renders on a time/size cadence instead of per token
+"""
+import time
+
+SENTENCE_ENDINGS = (".", "!", "?", ":", "\n")
+
+
+class BufferedStreamRenderer:
+
+    def __init__(self, placeholder, min_interval=0.05, max_interval=0.25, max_pending_chars=400,
+                 sentence_interval=0.02):
+        """
+        Initialize the renderer
+
+        Re-rendering markdown costs time proportional to the text length, so
+        the flush interval grows from `min_interval` towards `max_interval`
+        as the answer gets longer. The final frame is always rendered as soon
+        as the stream ends.
+
+        Args:
+            placeholder: Anything with a `markdown(text)` method (e.g. st.empty())
+            min_interval: Flush interval (seconds) for short answers
+            max_interval: Upper bound for the flush interval on long answers
+            max_pending_chars: Flush once this many characters are buffered
+            sentence_interval: Minimum gap before flushing early on a sentence boundary
+        """
+        self.placeholder = placeholder
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_pending_chars = max_pending_chars
+        self.sentence_interval = sentence_interval
+
+        self._text = ""
+        self._pending = []
+        self._pending_chars = 0
+        self._last_flush = time.perf_counter()
+        self.tokens = 0
+        self.flushes = 0
+
+    def _interval(self):
+        """Flush interval scaled by how much text each render has to redraw"""
+        scale = 1 + len(self._text) / 2000
+        return min(self.min_interval * scale, self.max_interval)
+
+    def write(self, token):
+        """Buffer one token, flushing if the cadence says it is time"""
+        if not token:
+            return
+        self._pending.append(token)
+        self._pending_chars += len(token)
+        self.tokens += 1
+
+        elapsed = time.perf_counter() - self._last_flush
+        if (
+            elapsed >= self._interval()
+            or self._pending_chars >= self.max_pending_chars
+            or (token.rstrip(" ").endswith(SENTENCE_ENDINGS) and elapsed >= self.sentence_interval)
+        ):
+            self.flush()
+
+    def flush(self):
+        """Render everything buffered so far"""
+        if not self._pending:
+            return
+        self._text += "".join(self._pending)
+        self._pending = []
+        self._pending_chars = 0
+        self.placeholder.markdown(self._text)
+        self._last_flush = time.perf_counter()
+        self.flushes += 1
+
+    @property
+    def text(self):
+        """Full text received so far (rendered or not)"""
+        return self._text + "".join(self._pending)
+
+    def close(self):
+        """Render the final frame immediately and return the full text"""
+        self.flush()
+        return self._text
+
+    def stream(self, tokens):
+        """
+        Render a token iterator to the placeholder
+
+        Args:
+            tokens: Iterable of text chunks (e.g. LLMApp.stream_chat(...))
+
+        Returns:
+            The full response text
+        """
+        try:
+            for token in tokens:
+                self.write(token)
+        finally:
+            self.close()
+        return self._text
@@ -0,0 +1,258 @@
+"""
+Server-Sent Events front-end for LLMApp.astream_chat
+Serves many concurrent streams on one asyncio event loop, with a concurrency
+limit, per-connection cancellation and write backpressure
+
+Usage:
+    python server.py --port 8000 --max-streams 64
+
+    curl -N -X POST localhost:8000/chat -d '{"message": "Hello"}'
+"""
+import argparse
+import asyncio
+import json
+from urllib.parse import urlparse, parse_qs
+
+from main import LLMApp
+from telemetry import StreamStats
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 64 * 1024
+
+# Pause reading from the model once this much output is waiting on a slow client
+WRITE_BUFFER_HIGH = 64 * 1024
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    503: "Service Unavailable",
+}
+
+
+class SSEServer:
+
+    def __init__(self, app, max_streams=64, queue_timeout=0.0, send_timeout=30.0):
+        """
+        Initialize the SSE server
+
+        Args:
+            app: LLMApp whose `astream_chat` produces the tokens
+            max_streams: Maximum number of concurrent upstream streams
+            queue_timeout: Seconds a request may wait for a free slot before a 503
+            send_timeout: Seconds a client may stall a write before it is dropped
+        """
+        self.app = app
+        self.max_streams = max_streams
+        self.queue_timeout = queue_timeout
+        self.send_timeout = send_timeout
+        self._slots = asyncio.Semaphore(max_streams)
+        self.active_streams = 0
+        self.stats = {"served": 0, "rejected": 0, "cancelled": 0, "errors": 0}
+
+    async def handle(self, reader, writer):
+        """Serve one HTTP connection"""
+        writer.transport.set_write_buffer_limits(high=WRITE_BUFFER_HIGH)
+        try:
+            request = await self._read_request(reader)
+            if isinstance(request, int):
+                await self._respond(writer, request, {"error": REASONS[request]})
+                return
+
+            method, path, query, body = request
+            if path == "/health":
+                await self._respond(writer, 200, {
+                    "status": "ok",
+                    "active_streams": self.active_streams,
+                    "max_streams": self.max_streams,
+                    **self.stats,
+                    "stream_stats": self.app.stream_stats.summary(),
+                })
+            elif path == "/chat":
+                if method not in ("GET", "POST"):
+                    await self._respond(writer, 405, {"error": "use GET or POST"})
+                    return
+                params = self._chat_params(method, query, body)
+                if params is None:
+                    await self._respond(writer, 400, {"error": "a non-empty 'message' is required"})
+                    return
+                await self._serve_chat(reader, writer, params)
+            else:
+                await self._respond(writer, 404, {"error": f"unknown path {path}"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _read_request(self, reader):
+        """Parse the request line, headers and body; return an HTTP status on failure"""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.LimitOverrunError:
+            return 413
+        if len(head) > MAX_HEADER_BYTES:
+            return 413
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            return 400
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            return 400
+        if length < 0:
+            return 400
+        if length > MAX_BODY_BYTES:
+            return 413
+        body = await reader.readexactly(length) if length else b""
+
+        url = urlparse(target)
+        return method.upper(), url.path, parse_qs(url.query), body
+
+    @staticmethod
+    def _chat_params(method, query, body):
+        """Extract chat arguments from the query string (GET) or JSON body (POST)"""
+        if method == "POST":
+            try:
+                data = json.loads(body or b"{}")
+            except ValueError:
+                return None
+            if not isinstance(data, dict):
+                return None
+        else:
+            data = {k: v[0] for k, v in query.items()}
+
+        message = str(data.get("message", "")).strip()
+        if not message:
+            return None
+        try:
+            return {
+                "user_message": message,
+                "system_prompt": data.get("system_prompt") or None,
+                "temperature": float(data.get("temperature", 0.5)),
+                "max_tokens": int(data.get("max_tokens", 1024)),
+            }
+        except (TypeError, ValueError):
+            return None
+
+    async def _serve_chat(self, reader, writer, params):
+        """Stream one answer as SSE, holding a concurrency slot for its duration"""
+        try:
+            if self.queue_timeout > 0:
+                await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+            elif self._slots.locked():
+                raise asyncio.TimeoutError
+            else:
+                await self._slots.acquire()
+        except asyncio.TimeoutError:
+            self.stats["rejected"] += 1
+            await self._respond(writer, 503, {"error": "too many concurrent streams"}, {"Retry-After": "1"})
+            return
+
+        self.active_streams += 1
+        try:
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: text/event-stream\r\n"
+                b"Cache-Control: no-cache\r\n"
+                b"Connection: close\r\n"
+                b"X-Accel-Buffering: no\r\n\r\n"
+            )
+            await writer.drain()
+
+            # The client sends nothing after the request, so EOF means it disconnected
+            stream_task = asyncio.create_task(self._pump(writer, params))
+            disconnect_task = asyncio.create_task(reader.read(1))
+            done, _ = await asyncio.wait({stream_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+
+            if stream_task not in done:
+                # Cancelling the pump closes the astream_chat generator and the upstream stream
+                stream_task.cancel()
+                self.stats["cancelled"] += 1
+            else:
+                disconnect_task.cancel()
+            await asyncio.gather(stream_task, disconnect_task, return_exceptions=True)
+        finally:
+            self.active_streams -= 1
+            self._slots.release()
+
+    async def _pump(self, writer, params):
+        """Copy tokens from the model to the client, waiting on drain for backpressure"""
+        stats = StreamStats(self.app.model)
+        tokens = self.app.astream_chat(**params, stats=stats)
+        try:
+            async for content in tokens:
+                await self._send(writer, None, {"token": content})
+            await self._send(writer, "done", stats.as_dict())
+            self.stats["served"] += 1
+        except (ConnectionError, asyncio.TimeoutError):
+            # Client went away or stopped reading: stop pulling from upstream
+            self.stats["cancelled"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            try:
+                await self._send(writer, "error", {"error": str(e)})
+            except (ConnectionError, asyncio.TimeoutError):
+                pass
+        finally:
+            await tokens.aclose()
+
+    async def _send(self, writer, event, data):
+        """Write one SSE event; drain() blocks while the client's buffer is full"""
+        frame = f"event: {event}\n" if event else ""
+        frame += f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+        writer.write(frame.encode("utf-8"))
+        await asyncio.wait_for(writer.drain(), timeout=self.send_timeout)
+
+    @staticmethod
+    async def _respond(writer, status, payload, extra_headers=None):
+        """Send a small JSON response"""
+        body = json.dumps(payload).encode("utf-8")
+        headers = {
+            "Content-Type": "application/json",
+            "Content-Length": str(len(body)),
+            "Connection": "close",
+            **(extra_headers or {}),
+        }
+        head = f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+        head += "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n"
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def serve(self, host="127.0.0.1", port=8000):
+        """Run the server until cancelled"""
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER_BYTES)
+        print(f"Serving SSE on http://{host}:{port}/chat (max {self.max_streams} streams)")
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SSE streaming server for LLMApp")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--model", default="llama-3.3-70b-versatile")
+    parser.add_argument("--max-streams", type=int, default=64)
+    parser.add_argument("--queue-timeout", type=float, default=0.0,
+                        help="Seconds to wait for a free slot before answering 503")
+    args = parser.parse_args()
+
+    sse_server = SSEServer(LLMApp(model=args.model), max_streams=args.max_streams, queue_timeout=args.queue_timeout)
+    try:
+        asyncio.run(sse_server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
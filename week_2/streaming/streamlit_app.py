@@ -3,6 +3,7 @@ Streamlit Frontend for Groq LLM Application
 """
 import streamlit as st
 from main import LLMApp
+from renderer import BufferedStreamRenderer
 import traceback
 
 # page configuration
@@ -51,6 +52,23 @@ with st.sidebar:
         help = "Stream responses word by word for a more interactive experience"
     )
 
+    # latency budgets (only apply to streamed answers)
+    with st.expander("Latency budget"):
+        first_token_deadline = st.number_input(
+            "First-token deadline (s)",
+            min_value=0.0,
+            value=0.0,
+            step=0.5,
+            help="Switch to llama-3.1-8b-instant if no token arrives in time. 0 disables."
+        )
+        time_budget = st.number_input(
+            "Total time budget (s)",
+            min_value=0.0,
+            value=0.0,
+            step=1.0,
+            help="End the answer at a sentence boundary once this budget is spent. 0 disables."
+        )
+
     temperature = st.slider(
         "Temperature",
         min_value=0.0,
@@ -93,6 +111,8 @@ if st.session_state.llm_app is None:
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
+        if message.get("stats"):
+            st.caption(message["stats"])
 
 # Chat input
 if prompt := st.chat_input("Type your message here..."):
@@ -116,22 +136,26 @@ if prompt := st.chat_input("Type your message here..."):
 
                 if enable_streaming:
                     message_placeholder = st.empty()
-                    full_response = ""
-
-                    for token in st.session_state.llm_app.stream_chat(
-                        user_message=prompt,
-                        system_prompt=system_prompt if system_prompt else None,
-                        temperature=temperature,
-                        max_tokens=max_tokens
-                    ):
-                        full_response += token
-                        message_placeholder.markdown(full_response)
-
-                    message_placeholder.markdown(full_response)
+
+                    # Coalesce tokens and re-render on a ~50 ms / sentence cadence
+                    renderer = BufferedStreamRenderer(message_placeholder)
+                    full_response = renderer.stream(
+                        st.session_state.llm_app.stream_chat(
+                            user_message=prompt,
+                            system_prompt=system_prompt if system_prompt else None,
+                            temperature=temperature,
+                            max_tokens=max_tokens,
+                            time_budget=time_budget or None,
+                            first_token_deadline=first_token_deadline or None
+                        )
+                    )
+                    stats_line = st.session_state.llm_app.last_stream_stats.format()
+                    st.caption(stats_line)
                     st.session_state.messages.append(
                         {
                             "role": "assistant",
-                            "content": f"{full_response}"
+                            "content": f"{full_response}",
+                            "stats": stats_line
                         }
                     )
                 
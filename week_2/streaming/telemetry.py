@@ -0,0 +1,159 @@
+"""
+Streaming telemetry for LLMApp.stream_chat
+Time-to-first-token, inter-token latency percentiles, token counts and throughput
+"""
+import time
+
+
+def percentile(values, q):
+    """Linear-interpolated percentile (q in 0-100) of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class StreamStats:
+
+    def __init__(self, model):
+        """
+        Timing record for one streamed response
+
+        Args:
+            model: Model that produced the stream
+        """
+        self.model = model
+        self.started_at = time.perf_counter()
+        self.first_token_at = None
+        self.finished_at = None
+        self.chunks = 0
+        self.completion_tokens = None  # provider-reported, when available
+        self.inter_token_latencies = []
+        self._last_token_at = None
+        # Set by deadline-aware streams: "primary" or "fallback", and why the stream ended
+        self.path = "primary"
+        self.stop_reason = "complete"
+
+    def on_token(self):
+        """Record the arrival of one content chunk"""
+        now = time.perf_counter()
+        if self.first_token_at is None:
+            self.first_token_at = now
+        else:
+            self.inter_token_latencies.append(now - self._last_token_at)
+        self._last_token_at = now
+        self.chunks += 1
+
+    def finish(self, completion_tokens=None):
+        """Mark the stream as finished"""
+        self.finished_at = time.perf_counter()
+        if completion_tokens is not None:
+            self.completion_tokens = completion_tokens
+
+    @property
+    def ttft(self):
+        """Seconds from request to first content token"""
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started_at
+
+    @property
+    def total_time(self):
+        """Seconds from request to end of stream"""
+        end = self.finished_at or time.perf_counter()
+        return end - self.started_at
+
+    @property
+    def total_tokens(self):
+        """Output tokens: provider-reported if known, otherwise one per streamed chunk"""
+        return self.completion_tokens if self.completion_tokens is not None else self.chunks
+
+    @property
+    def tokens_per_second(self):
+        """Output throughput over the generation phase (after the first token)"""
+        if self.first_token_at is None:
+            return None
+        generation_time = (self.finished_at or time.perf_counter()) - self.first_token_at
+        if generation_time <= 0:
+            return None
+        return self.total_tokens / generation_time
+
+    def itl_percentile(self, q):
+        """Inter-token latency percentile in seconds"""
+        return percentile(self.inter_token_latencies, q)
+
+    def as_dict(self):
+        return {
+            "model": self.model,
+            "ttft_s": self.ttft,
+            "total_time_s": self.total_time,
+            "total_tokens": self.total_tokens,
+            "tokens_per_s": self.tokens_per_second,
+            "itl_p50_s": self.itl_percentile(50),
+            "itl_p95_s": self.itl_percentile(95),
+            "itl_p99_s": self.itl_percentile(99),
+            "path": self.path,
+            "stop_reason": self.stop_reason,
+        }
+
+    def format(self):
+        """One-line human readable summary"""
+        def ms(value):
+            return f"{value * 1000:.0f} ms" if value is not None else "–"
+
+        tps = self.tokens_per_second
+        return (
+            f"TTFT {ms(self.ttft)} · ITL p50 {ms(self.itl_percentile(50))} / p95 {ms(self.itl_percentile(95))}"
+            f" · {self.total_tokens} tokens · {f'{tps:.1f}' if tps else '–'} tok/s"
+            f" · total {self.total_time:.2f}s"
+            + (f" · path: {self.path}" if self.path != "primary" else "")
+            + (f" · stopped: {self.stop_reason}" if self.stop_reason != "complete" else "")
+        )
+
+
+class StreamStatsAggregate:
+
+    def __init__(self, max_samples=1000):
+        """
+        Rolling aggregate of StreamStats across calls
+
+        Args:
+            max_samples: Number of most recent streams kept for percentiles
+        """
+        self.max_samples = max_samples
+        self.samples = []
+        self.count = 0
+
+    def add(self, stats):
+        self.count += 1
+        self.samples.append(stats)
+        if len(self.samples) > self.max_samples:
+            del self.samples[: len(self.samples) - self.max_samples]
+
+    def summary(self):
+        """Percentiles of per-call TTFT and throughput, and pooled inter-token latency"""
+        ttfts = [s.ttft for s in self.samples if s.ttft is not None]
+        tps = [s.tokens_per_second for s in self.samples if s.tokens_per_second]
+        itls = [itl for s in self.samples for itl in s.inter_token_latencies]
+        return {
+            "calls": self.count,
+            "ttft_p50_s": percentile(ttfts, 50),
+            "ttft_p95_s": percentile(ttfts, 95),
+            "itl_p50_s": percentile(itls, 50),
+            "itl_p95_s": percentile(itls, 95),
+            "itl_p99_s": percentile(itls, 99),
+            "tokens_per_s_p50": percentile(tps, 50),
+            "total_tokens": sum(s.total_tokens for s in self.samples),
+            "paths": self._count("path"),
+            "stop_reasons": self._count("stop_reason"),
+        }
+
+    def _count(self, attribute):
+        counts = {}
+        for s in self.samples:
+            value = getattr(s, attribute)
+            counts[value] = counts.get(value, 0) + 1
+        return counts
@@ -1,12 +1,16 @@
+import hashlib
+import json
 import os
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from langchain_community.vectorstores import Chroma
 from langchain_core.documents import Document
+from src.utils.embedding_cache import CachedEmbeddings
 from src.utils.llm import get_embeddings
 from src.utils.text import chunk_text
 from pypdf import PdfReader
 
 SUPPORTED_EXT = {".pdf", ".txt", ".md"}
+MANIFEST_NAME = "manifest.json"
 
 def read_text(path: str) -> str:
     ext = os.path.splitext(path)[1].lower()
@@ -16,23 +20,116 @@ def read_text(path: str) -> str:
     with open(path, "r", encoding="utf-8", errors="ignore") as f:
         return f.read()
 
-def build_or_update_index(files: List[str], persist_dir: str = ".chroma/voice", embeddings_provider: Optional[str] = None):
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _chunk_id(source: str, chunk: str) -> str:
+    """Content-addressed chunk id: identical chunks of the same source share an id."""
+    return hashlib.sha256(f"{source}\0{chunk}".encode("utf-8")).hexdigest()
+
+def _load_manifest(persist_dir: str) -> Dict[str, Any]:
+    path = os.path.join(persist_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {"files": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _save_manifest(persist_dir: str, manifest: Dict[str, Any]) -> None:
+    path = os.path.join(persist_dir, MANIFEST_NAME)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+
+def build_or_update_index(files: List[str], persist_dir: str = ".chroma/voice", embeddings_provider: Optional[str] = None,
+                          prune: bool = False) -> Dict[str, Any]:
+    """Incrementally sync the Chroma store with `files`.
+
+    A manifest of file and chunk content hashes is kept next to the store, so
+    unchanged files are skipped without re-reading, only new chunks are
+    embedded, and chunks of changed files are deleted. Files indexed earlier
+    but not in `files` are kept unless `prune` is set, so documents can be
+    added a few at a time.
+
+    Returns a dict with the vector store, skipped/added/removed chunk counts,
+    the number of "documents" now in the store and embedding cache stats.
+    """
     emb = get_embeddings(embeddings_provider)
     os.makedirs(persist_dir, exist_ok=True)
+    manifest = _load_manifest(persist_dir)
+    indexed: Dict[str, Dict[str, Any]] = manifest["files"]
+
+    texts, metadatas, ids = [], [], []
+    stale_ids: List[str] = []
+    updated: Dict[str, Dict[str, Any]] = {}
+    skipped = 0
+    seen_sources = set()
 
-    texts = []
-    metadatas = []
     for path in files:
         if os.path.splitext(path)[1].lower() not in SUPPORTED_EXT:
             continue
+        source = os.path.basename(path)
+        seen_sources.add(source)
+        file_hash = _file_hash(path)
+        previous = indexed.get(source)
+        if previous and previous["sha256"] == file_hash:
+            skipped += len(previous["chunks"])
+            continue
+
         raw = read_text(path)
+        known = set(previous["chunks"]) if previous else set()
+        chunk_ids: Dict[str, None] = {}  # ordered set; drops duplicate chunks within the file
         for chunk in chunk_text(raw, chunk_size=1100, chunk_overlap=120):
-            texts.append(chunk)
-            metadatas.append({"source": os.path.basename(path)})
+            cid = _chunk_id(source, chunk)
+            if cid in chunk_ids:
+                continue
+            chunk_ids[cid] = None
+            if cid in known:
+                skipped += 1
+            else:
+                texts.append(chunk)
+                metadatas.append({"source": source})
+                ids.append(cid)
+        stale_ids.extend(known - chunk_ids.keys())
+        updated[source] = {"sha256": file_hash, "chunks": list(chunk_ids)}
 
-    if not texts:
+    if not seen_sources:
         raise ValueError("No supported documents provided.")
 
-    vect = Chroma.from_texts(texts=texts, embedding=emb, metadatas=metadatas, persist_directory=persist_dir)
-    vect.persist()
-    return vect
\ No newline at end of file
+    if prune:
+        for source in set(indexed) - seen_sources:
+            stale_ids.extend(indexed[source]["chunks"])
+            updated[source] = None
+
+    vect = Chroma(persist_directory=persist_dir, embedding_function=emb)
+    if not os.path.exists(os.path.join(persist_dir, MANIFEST_NAME)):
+        # Store built before manifests existed: its chunks have random ids we
+        # cannot match, so clear them once instead of keeping duplicates
+        stale_ids.extend(vect.get(include=[])["ids"])
+    if stale_ids:
+        vect.delete(ids=stale_ids)
+    if texts:
+        vect.add_texts(texts=texts, metadatas=metadatas, ids=ids)
+    if stale_ids or texts:
+        vect.persist()
+
+    for source, entry in updated.items():
+        if entry is None:
+            indexed.pop(source, None)
+        else:
+            indexed[source] = entry
+    _save_manifest(persist_dir, manifest)
+
+    return {
+        "vector": vect,
+        "files": len(seen_sources),
+        "added": len(texts),
+        "skipped": skipped,
+        "removed": len(stale_ids),
+        "documents": len(indexed),
+        "embedding_cache": emb.summary() if isinstance(emb, CachedEmbeddings) else None,
+    }
@@ -1,3 +1,4 @@
+from typing import Iterator
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from src.utils.llm import get_llm
@@ -7,7 +8,8 @@ RAG_PROMPT = ChatPromptTemplate.from_messages([
     ("human", "Question: {question}\n\nContext:\n{context}")
 ])
 
-def ask(vect, question: str, provider: str = "auto", model: str = None, temperature: float = 0.1, k: int = 4) -> str:
+def stream_ask(vect, question: str, provider: str = "auto", model: str = None, temperature: float = 0.1, k: int = 4) -> Iterator[str]:
+    """Like `ask`, but yields the answer as it is generated."""
     retr = vect.as_retriever(search_kwargs={"k": k})
     docs = retr.invoke(question)
     context_parts = []
@@ -18,4 +20,7 @@ def ask(vect, question: str, provider: str = "auto", model: str = None, temperat
     context = "\n\n".join(context_parts)
     llm = get_llm(provider=provider, model=model, temperature=temperature)
     chain = RAG_PROMPT | llm | StrOutputParser()
-    return chain.invoke({"question": question, "context": context})
\ No newline at end of file
+    yield from chain.stream({"question": question, "context": context})
+
+def ask(vect, question: str, provider: str = "auto", model: str = None, temperature: float = 0.1, k: int = 4) -> str:
+    return "".join(stream_ask(vect, question, provider=provider, model=model, temperature=temperature, k=k))
\ No newline at end of file
@@ -0,0 +1,216 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterator, List, Literal, Optional, Tuple
+
+from src.utils.text import count_tokens, plan_chunks
+
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("SUMMARY_MAX_CONCURRENCY", "8"))
+DEFAULT_MAX_RETRIES = 2
+# Largest block of partial summaries handed to one reduce call
+DEFAULT_REDUCE_TOKEN_BUDGET = int(os.getenv("SUMMARY_REDUCE_TOKEN_BUDGET", "3000"))
+MAX_REDUCE_DEPTH = 5
+# Cap on map chunk size, so each section keeps its own bullets and requests stay under
+# per-minute token limits; 0 lets chunks grow as large as the model's context allows
+DEFAULT_MAX_CHUNK_TOKENS = int(os.getenv("SUMMARY_MAX_CHUNK_TOKENS", "4000")) or None
+
+ReduceMode = Literal["flat", "tree"]
+
+
+class MapReduceEngine:
+    """Map-reduce summarization shared by the news and YouTube summarizers.
+
+    Map calls run concurrently on a thread pool (at most `max_concurrency` in
+    flight). A failed chunk is retried on its own with exponential backoff,
+    so one flaky call does not redo the whole batch. Outputs keep chunk order.
+    `stream` yields map outputs as chunks complete and then the reduce tokens,
+    so callers can show progress long before the final summary is ready.
+    A single chunk that fits `reduce_token_budget` skips the map step and is
+    handed to the reduce prompt as is: one LLM call instead of two.
+
+    In "tree" reduce mode, partial summaries that exceed `reduce_token_budget`
+    are grouped into token-bounded batches, each batch is condensed by
+    `collapse_chain` in parallel, and this repeats until the points fit one
+    final reduce call. Reduce latency then grows with log(chunks) and the
+    final prompt never overflows the context window. "flat" mode sends all
+    points to a single reduce call.
+    """
+
+    def __init__(self, map_chain, reduce_chain, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 max_retries: int = DEFAULT_MAX_RETRIES, retry_backoff: float = 1.0,
+                 collapse_chain=None, reduce_mode: ReduceMode = "tree",
+                 reduce_token_budget: int = DEFAULT_REDUCE_TOKEN_BUDGET,
+                 token_counter: Callable[[str], int] = count_tokens):
+        if reduce_mode not in ("flat", "tree"):
+            raise ValueError(f"Unknown reduce mode: {reduce_mode}")
+        self.map_chain = map_chain
+        self.reduce_chain = reduce_chain
+        self.collapse_chain = collapse_chain or reduce_chain
+        self.reduce_mode = reduce_mode
+        self.reduce_token_budget = reduce_token_budget
+        self.token_counter = token_counter
+        self.reduce_levels = 0
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.timings: Dict[str, float] = {}
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def _invoke(self, chain, inputs: Dict[str, Any], label: str) -> str:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return chain.invoke(inputs)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise RuntimeError(f"{label} failed after {attempt + 1} attempts: {e}") from e
+                with self._lock:
+                    self.retries += 1
+                time.sleep(self.retry_backoff * 2 ** attempt)
+
+    def _stream(self, chain, inputs: Dict[str, Any], label: str) -> Iterator[str]:
+        """Stream a chain's output; retried only while nothing has been yielded yet."""
+        for attempt in range(self.max_retries + 1):
+            emitted = False
+            try:
+                for token in chain.stream(inputs):
+                    emitted = True
+                    yield token
+                return
+            except Exception as e:
+                if emitted or attempt == self.max_retries:
+                    raise RuntimeError(f"{label} failed after {attempt + 1} attempts: {e}") from e
+                with self._lock:
+                    self.retries += 1
+                time.sleep(self.retry_backoff * 2 ** attempt)
+
+    def iter_map(self, chunks: List[str]) -> Iterator[Tuple[int, str]]:
+        """Yield (chunk index, map output) as each chunk completes."""
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(chunks) or 1)) as pool:
+            futures = {
+                pool.submit(self._invoke, self.map_chain, {"chunk": c}, f"Map of chunk {i}"): i
+                for i, c in enumerate(chunks)
+            }
+            try:
+                for future in as_completed(futures):
+                    yield futures[future], future.result()
+            finally:
+                # On error or early close, drop chunks that have not started yet
+                for future in futures:
+                    future.cancel()
+                self.timings["map_s"] = time.perf_counter() - start
+
+    def map(self, chunks: List[str]) -> List[str]:
+        """Map every chunk; results are returned in chunk order."""
+        points: List[str] = [""] * len(chunks)
+        for i, point in self.iter_map(chunks):
+            points[i] = point
+        return points
+
+    def batch_points(self, points: List[str]) -> List[List[str]]:
+        """Group consecutive points into batches of at most `reduce_token_budget` tokens."""
+        batches: List[List[str]] = []
+        current: List[str] = []
+        used = 0
+        for point in points:
+            tokens = self.token_counter(point)
+            if current and used + tokens > self.reduce_token_budget:
+                batches.append(current)
+                current, used = [], 0
+            current.append(point)
+            used += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def collapse(self, points: List[str], **inputs: Any) -> List[str]:
+        """Condense points level by level until they fit the reduce budget."""
+        self.reduce_levels = 0
+        while (self.reduce_mode == "tree" and len(points) > 1 and self.reduce_levels < MAX_REDUCE_DEPTH
+               and sum(self.token_counter(p) for p in points) > self.reduce_token_budget):
+            batches = self.batch_points(points)
+            level = self.reduce_levels + 1
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as pool:
+                points = list(pool.map(
+                    lambda item: self._invoke(
+                        self.collapse_chain,
+                        {**inputs, "points": "\n".join(item[1])},
+                        f"Reduce level {level} batch {item[0]}",
+                    ),
+                    enumerate(batches),
+                ))
+            self.reduce_levels = level
+        return points
+
+    def iter_reduce(self, points: List[str], **inputs: Any) -> Iterator[str]:
+        """Collapse points if needed, then stream the final reduce output."""
+        start = time.perf_counter()
+        try:
+            points = self.collapse(points, **inputs)
+            yield from self._stream(self.reduce_chain, {**inputs, "points": "\n".join(points)}, "Reduce")
+        finally:
+            self.timings["reduce_s"] = time.perf_counter() - start
+
+    def reduce(self, points: List[str], **inputs: Any) -> str:
+        return "".join(self.iter_reduce(points, **inputs))
+
+    def stream(self, chunks: List[str], **reduce_inputs: Any) -> Iterator[Tuple[str, Any]]:
+        """Run map-reduce as a stream of events.
+
+        Yields ("point", (chunk index, text)) as each map call completes
+        (none when a single chunk goes straight to the reduce),
+        ("reduce", number of points) when the reduce starts, ("token", text)
+        for each piece of the final summary and finally ("done", result) with
+        the same dict `run` returns.
+        """
+        self.timings = {}
+        self.retries = 0
+        start = time.perf_counter()
+        points: List[str] = [""] * len(chunks)
+        if len(chunks) == 1 and self.token_counter(chunks[0]) <= self.reduce_token_budget:
+            points = list(chunks)
+            self.timings["map_s"] = 0.0
+        else:
+            for i, point in self.iter_map(chunks):
+                points[i] = point
+                yield "point", (i, point)
+
+        yield "reduce", len(points)
+        parts = []
+        for token in self.iter_reduce(points, **reduce_inputs):
+            parts.append(token)
+            yield "token", token
+        self.timings["total_s"] = time.perf_counter() - start
+
+        yield "done", {
+            "points": points,
+            "summary": "".join(parts),
+            "timings": dict(self.timings),
+            "retries": self.retries,
+            "reduce_levels": self.reduce_levels,
+        }
+
+    def run(self, chunks: List[str], **reduce_inputs: Any) -> Dict[str, Any]:
+        """Map all chunks, then reduce. Extra keyword args are passed to the reduce prompt."""
+        return final_result(self.stream(chunks, **reduce_inputs))
+
+
+def final_result(events: Iterator[Tuple[str, Any]]) -> Dict[str, Any]:
+    """Drain an event stream and return the payload of its "done" event."""
+    result = None
+    for kind, payload in events:
+        if kind == "done":
+            result = payload
+    return result
+
+
+def plan_map_chunks(text: str, limits: Tuple[int, int],
+                    max_chunk_tokens: Optional[int] = DEFAULT_MAX_CHUNK_TOKENS) -> Tuple[List[str], Dict[str, Any]]:
+    """Chunk `text` for a model with (context, output) `limits`; returns the chunks and the plan without them."""
+    plan = plan_chunks(text, *limits, max_chunk_tokens=max_chunk_tokens, max_reduce_depth=MAX_REDUCE_DEPTH)
+    chunks = plan.pop("chunks")
+    print(f"Chunk plan: {plan['map_calls']} map + {plan['reduce_calls']} reduce calls{' (direct)' if plan['direct'] else ''}, "
+          f"{plan['chunk_tokens']}/{plan['token_budget']} tokens per chunk, ~{plan['input_tokens']} input tokens")
+    return chunks, plan
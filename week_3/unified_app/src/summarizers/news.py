@@ -1,9 +1,14 @@
-from typing import Literal, Dict, Any
+from typing import Literal, Dict, Any, Iterator, List, Optional, Tuple
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
-from src.utils.text import chunk_text
-from src.utils.llm import get_llm
+from src.utils.text import count_tokens, plan_chunks
+from src.utils.dedup import DEFAULT_THRESHOLD, dedupe_articles
+from src.utils.extractive import DEFAULT_KEEP_RATIO, extract_key_sentences, prefilter
+from src.utils.llm import get_llm, model_limits
+from src.summarizers.mapreduce import (
+    MapReduceEngine, ReduceMode, DEFAULT_MAX_CHUNK_TOKENS, DEFAULT_MAX_CONCURRENCY, final_result, plan_map_chunks,
+)
 
 SummaryType = Literal["concise", "detailed", "bullets"]
 
@@ -17,16 +22,107 @@ NEWS_REDUCE_PROMPT = ChatPromptTemplate.from_messages([
     ("human", "Points from all sections:\n\n{points}\n\nReturn a clean markdown summary.")
 ])
 
-def summarize_article_text(text: str, provider: str = "auto", model: str = None, style: SummaryType = "detailed", temperature: float = 0.1) -> Dict[str, Any]:
+# Intermediate step of the tree reduce: condense a batch of points, keep them as bullets
+NEWS_COLLAPSE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "You are a helpful analyst. Merge the following points into at most 6 bullet points. Drop repetition, keep facts only."),
+    ("human", "{points}")
+])
+
+def stream_article_summary(text: str, provider: str = "auto", model: str = None, style: SummaryType = "detailed", temperature: float = 0.1,
+                           max_concurrency: int = DEFAULT_MAX_CONCURRENCY, reduce_mode: ReduceMode = "tree",
+                           extractive_ratio: Optional[float] = DEFAULT_KEEP_RATIO) -> Iterator[Tuple[str, Any]]:
+    """Summarize as a stream of events: ("plan", plan), ("chunks", count), then the MapReduceEngine.stream events.
+
+    Chunks are sized to the model's context window (see `plan_chunks`); the
+    plan (call counts, token totals) is yielded before any LLM call. With
+    `extractive_ratio` (0-1) only that fraction of the highest-ranked
+    sentences is chunked and sent to the map step. The final ("done", result)
+    payload also carries the chunk count, the plan and the "prefilter" stats (or None).
+    """
     llm = get_llm(provider=provider, model=model, temperature=temperature)
-    chunks = chunk_text(text, chunk_size=1200, chunk_overlap=150)
+    filtered = prefilter(text, extractive_ratio)
+    if filtered:
+        text = filtered["text"]
+        yield "status", f"Kept {filtered['kept']}/{filtered['sentences']} key sentences ({filtered['compression']:.0%} of the tokens)"
+    chunks, plan = plan_map_chunks(text, model_limits(provider, model))
+    yield "plan", plan
+    yield "chunks", len(chunks)
+
+    engine = MapReduceEngine(
+        NEWS_MAP_PROMPT | llm | StrOutputParser(),
+        NEWS_REDUCE_PROMPT | llm | StrOutputParser(),
+        max_concurrency=max_concurrency,
+        collapse_chain=NEWS_COLLAPSE_PROMPT | llm | StrOutputParser(),
+        reduce_mode=reduce_mode,
+        reduce_token_budget=plan["reduce_token_budget"],
+    )
+    for kind, payload in engine.stream(chunks, style=style):
+        if kind == "done":
+            payload = {"chunks": len(chunks), "plan": plan, "prefilter": filtered, **payload}
+        yield kind, payload
+
+def stream_digest_summary(articles: List[Tuple[str, str]], provider: str = "auto", model: str = None, style: SummaryType = "detailed",
+                          temperature: float = 0.1, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                          reduce_mode: ReduceMode = "tree", dedup: bool = True,
+                          dedup_threshold: float = DEFAULT_THRESHOLD,
+                          extractive_ratio: Optional[float] = DEFAULT_KEEP_RATIO) -> Iterator[Tuple[str, Any]]:
+    """One summary over many (url, text) articles; same events as `stream_article_summary`.
+
+    Near-duplicate articles (the same wire story from several outlets) are
+    collapsed first, so each story is summarized once with all its source
+    URLs. The remaining articles are chunked together, the map step runs
+    across all of them at once and the tree reduce merges their points into
+    a single digest. The extractive prefilter, if on, runs per story so the
+    source lines are never dropped. The "done" payload carries the dedup
+    savings and prefilter stats.
+    """
+    clusters = dedupe_articles(articles, dedup_threshold) if dedup else [
+        {"url": url, "text": text, "urls": [url], "dropped": []} for url, text in articles
+    ]
+    dropped = [text for c in clusters for text in c["dropped"]]
+    savings = {
+        "articles": len(articles),
+        "stories": len(clusters),
+        "duplicates": len(dropped),
+        "tokens_saved": sum(count_tokens(t) for t in dropped),
+        # Chunks the dropped copies would have added to the map step
+        "map_calls_saved": len(plan_chunks(
+            "\n\n".join(dropped), *model_limits(provider, model), max_chunk_tokens=DEFAULT_MAX_CHUNK_TOKENS,
+        )["chunks"]) if dropped else 0,
+        "clusters": [c["urls"] for c in clusters if len(c["urls"]) > 1],
+    }
+    if dropped:
+        print(f"Digest dedup: {len(articles)} articles -> {len(clusters)} stories, "
+              f"~{savings['map_calls_saved']} map calls / {savings['tokens_saved']} tokens saved")
+        yield "status", f"Collapsed {len(dropped)} near-duplicate articles into {len(savings['clusters'])} stories"
+
+    use_prefilter = bool(extractive_ratio) and extractive_ratio < 1
+    filtered = [extract_key_sentences(c["text"], extractive_ratio) if use_prefilter else None for c in clusters]
+    prefilter_stats = None
+    if use_prefilter:
+        prefilter_stats = {
+            key: sum(f[key] for f in filtered) for key in ("sentences", "kept", "tokens_in", "tokens_out")
+        }
+        prefilter_stats["compression"] = prefilter_stats["tokens_out"] / max(prefilter_stats["tokens_in"], 1)
+        print(f"Extractive prefilter kept {prefilter_stats['kept']}/{prefilter_stats['sentences']} sentences "
+              f"across {len(clusters)} stories ({prefilter_stats['compression']:.0%} of the tokens)")
+        yield "status", f"Kept {prefilter_stats['kept']}/{prefilter_stats['sentences']} key sentences ({prefilter_stats['compression']:.0%} of the tokens)"
 
-    # Map step
-    map_chain = NEWS_MAP_PROMPT | llm | StrOutputParser()
-    points = []
-    for c in chunks:
-        points.append(map_chain.invoke({"chunk": c}))
+    text = "\n\n".join(
+        f"Sources: {', '.join(c['urls'])}\n\n{f['text'] if f else c['text']}" for c, f in zip(clusters, filtered)
+    )
+    for kind, payload in stream_article_summary(
+        text, provider=provider, model=model, style=style, temperature=temperature,
+        max_concurrency=max_concurrency, reduce_mode=reduce_mode, extractive_ratio=None,
+    ):
+        if kind == "done":
+            payload = {"articles": len(articles), "dedup": savings, **payload, "prefilter": prefilter_stats}
+        yield kind, payload
 
-    reduce_chain = NEWS_REDUCE_PROMPT | llm | StrOutputParser()
-    final = reduce_chain.invoke({"points": "\n".join(points), "style": style})
-    return {"chunks": len(chunks), "points": points, "summary": final}
\ No newline at end of file
+def summarize_article_text(text: str, provider: str = "auto", model: str = None, style: SummaryType = "detailed", temperature: float = 0.1,
+                           max_concurrency: int = DEFAULT_MAX_CONCURRENCY, reduce_mode: ReduceMode = "tree",
+                           extractive_ratio: Optional[float] = DEFAULT_KEEP_RATIO) -> Dict[str, Any]:
+    return final_result(stream_article_summary(
+        text, provider=provider, model=model, style=style, temperature=temperature,
+        max_concurrency=max_concurrency, reduce_mode=reduce_mode, extractive_ratio=extractive_ratio,
+    ))
@@ -1,13 +1,22 @@
-from typing import Dict, Any, Optional, List
+import os
+import shutil
+from typing import Dict, Any, Optional, List, Iterator, Tuple
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.documents import Document
 from langchain_community.vectorstores import Chroma
 from langchain_core.runnables import RunnablePassthrough
 from src.utils.text import chunk_text
-from src.utils.llm import get_llm, get_embeddings
-from src.utils.youtube import get_youtube_transcript, download_audio_with_ytdlp
+from src.utils.embedding_cache import CachedEmbeddings
+from src.utils.llm import get_llm, get_embeddings, model_limits
+from src.utils.youtube import get_youtube_transcript, download_audio_with_ytdlp, _extract_video_id
+from src.utils.video_cache import VideoCache, video_cache
 from src.utils.audio import transcribe_audio
+from src.utils.extractive import DEFAULT_KEEP_RATIO, prefilter
+from src.summarizers.mapreduce import MapReduceEngine, ReduceMode, DEFAULT_MAX_CONCURRENCY, final_result, plan_map_chunks
+
+# Bump when the summary prompts change so cached video summaries are regenerated
+SUMMARY_PROMPT_VERSION = "1"
 
 SUMMARY_MAP_PROMPT = ChatPromptTemplate.from_messages([
     ("system", "Summarize the following transcript section in 2-3 concise bullets (facts only)."),
@@ -19,57 +28,152 @@ SUMMARY_REDUCE_PROMPT = ChatPromptTemplate.from_messages([
     ("human", "{points}")
 ])
 
+# Intermediate step of the tree reduce for long videos
+SUMMARY_COLLAPSE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "Merge these transcript notes into at most 6 concise bullets (facts only, no repetition)."),
+    ("human", "{points}")
+])
+
 QA_PROMPT = ChatPromptTemplate.from_messages([
     ("system", "You are a helpful assistant. Answer strictly using the provided context. If unsure, say you don't know."),
     ("human", "Question: {question}\n\nContext:\n{context}")
 ])
 
-def process_youtube(url: str, provider: str = "auto", model: str = None, embeddings_provider: str = None, temperature: float = 0.1, persist_dir: str = None) -> Dict[str, Any]:
+class LazyVectorStore:
+    """Opens a persisted Chroma collection on first use (e.g. the first Q&A question)."""
+
+    def __init__(self, persist_dir: str, embeddings):
+        self.persist_dir = persist_dir
+        self.embeddings = embeddings
+        self._store = None
+
+    def _load(self):
+        if self._store is None:
+            print(f"Loading cached vector store from {self.persist_dir}")
+            self._store = Chroma(persist_directory=self.persist_dir, embedding_function=self.embeddings)
+        return self._store
+
+    def __getattr__(self, name: str):
+        return getattr(self._load(), name)
+
+def stream_youtube(url: str, provider: str = "auto", model: str = None, embeddings_provider: str = None, temperature: float = 0.1, persist_dir: str = None,
+                   max_concurrency: int = DEFAULT_MAX_CONCURRENCY, reduce_mode: ReduceMode = "tree",
+                   cache: Optional[VideoCache] = video_cache,
+                   extractive_ratio: Optional[float] = DEFAULT_KEEP_RATIO) -> Iterator[Tuple[str, Any]]:
+    """Process a video as a stream of events for progressive UIs.
+
+    Yields ("status", message) between stages, ("plan", plan) with the map
+    chunk plan unless the summary is cached, ("chunks", count), the
+    MapReduceEngine.stream "point"/"reduce"/"token" events while summarizing,
+    and finally ("done", result) once the vector store is built.
+
+    With a `cache`, the transcript, the summary (per provider, model, prompt
+    version and reduce mode) and the video's own vector collection are reused
+    on later runs; a cached collection is only opened when it is first queried.
+    Pass `cache=None` to always rebuild into `persist_dir`.
+
+    With `extractive_ratio` (0-1) the summary is made from only that fraction
+    of the highest-ranked transcript sentences; Q&A still indexes all of it.
+    """
+    video_id = _extract_video_id(url)
+    cache = cache if video_id else None
+    cached = {"transcript": False, "summary": False, "vector": False}
+
     # 1) Transcript or STT
-    transcript = get_youtube_transcript(url)
-    if not transcript:
-        print(f"No transcript available for {url}, attempting audio download...")
-        audio_path = download_audio_with_ytdlp(url)
-        if not audio_path:
-            raise RuntimeError(
-                "Could not get transcript or download audio. "
-                "This may be due to: (1) Invalid YouTube URL, (2) Video has no captions and download failed, "
-                "(3) Network connectivity issues, or (4) Age-restricted/private video."
-            )
-        print(f"Audio downloaded to {audio_path}, transcribing...")
-        try:
-            transcript = transcribe_audio(audio_path)
-            print(f"Transcription completed: {len(transcript)} characters")
-        except Exception as e:
-            raise RuntimeError(f"Transcription failed: {e}")
+    transcript = cache.get_transcript(video_id) if cache else None
+    cached["transcript"] = transcript is not None
+    if transcript is None:
+        yield "status", "Fetching transcript..."
+        transcript = get_youtube_transcript(url)
+        source = "captions"
+        if not transcript:
+            print(f"No transcript available for {url}, attempting audio download...")
+            yield "status", "No captions found, downloading audio..."
+            audio_path = download_audio_with_ytdlp(url)
+            if not audio_path:
+                raise RuntimeError(
+                    "Could not get transcript or download audio. "
+                    "This may be due to: (1) Invalid YouTube URL, (2) Video has no captions and download failed, "
+                    "(3) Network connectivity issues, or (4) Age-restricted/private video."
+                )
+            print(f"Audio downloaded to {audio_path}, transcribing...")
+            yield "status", "Transcribing audio with Whisper..."
+            try:
+                transcript = transcribe_audio(audio_path)
+                print(f"Transcription completed: {len(transcript)} characters")
+            except Exception as e:
+                raise RuntimeError(f"Transcription failed: {e}")
+            finally:
+                # The download directory is private to this request; the transcript is what we keep
+                shutil.rmtree(os.path.dirname(audio_path), ignore_errors=True)
+            source = "whisper"
+        if cache:
+            cache.put_transcript(video_id, transcript, source=source)
 
-    # 2) Summarize (map-reduce)
-    try:
-        print(f"Getting LLM with provider={provider}, model={model}")
-        llm = get_llm(provider=provider, model=model, temperature=temperature)
-        print("LLM initialized successfully")
-    except Exception as e:
-        raise RuntimeError(f"Failed to initialize LLM: {e}")
-    
     try:
         chunks = chunk_text(transcript, chunk_size=1200, chunk_overlap=150)
         print(f"Text chunked into {len(chunks)} pieces")
     except Exception as e:
         raise RuntimeError(f"Failed to chunk text: {e}")
 
-    try:
-        map_chain = SUMMARY_MAP_PROMPT | llm | StrOutputParser()
-        partial = [map_chain.invoke({"chunk": c}) for c in chunks]
-        print(f"Map phase completed: {len(partial)} summaries")
-    except Exception as e:
-        raise RuntimeError(f"Failed in map phase: {e}")
-    
-    try:
-        reduce_chain = SUMMARY_REDUCE_PROMPT | llm | StrOutputParser()
-        summary = reduce_chain.invoke({"points": "\n".join(partial)})
-        print("Reduce phase completed")
-    except Exception as e:
-        raise RuntimeError(f"Failed in reduce phase: {e}")
+    # 2) Summarize (map-reduce)
+    summary_params = dict(
+        provider=provider, model=model, temperature=temperature, reduce_mode=reduce_mode,
+        prompt_version=SUMMARY_PROMPT_VERSION,
+    )
+    if extractive_ratio and extractive_ratio < 1:
+        summary_params["extractive_ratio"] = extractive_ratio  # keeps earlier unfiltered keys valid
+    summary_key = VideoCache.summary_key(**summary_params)
+    entry = cache.get_summary(video_id, summary_key) if cache else None
+
+    # The vector store keeps small retrieval chunks of the full transcript; the map step
+    # gets chunks sized to the model's context window, of the filtered transcript if enabled
+    map_chunks, filtered, plan = chunks, None, None
+    if entry is None:
+        filtered = prefilter(transcript, extractive_ratio)
+        if filtered:
+            yield "status", f"Kept {filtered['kept']}/{filtered['sentences']} key sentences ({filtered['compression']:.0%} of the tokens)"
+        map_chunks, plan = plan_map_chunks(filtered["text"] if filtered else transcript, model_limits(provider, model))
+        yield "plan", plan
+    yield "chunks", len(map_chunks)
+
+    if entry is not None:
+        cached["summary"] = True
+        summary, timings, retries, reduce_levels = entry["summary"], {}, 0, entry.get("reduce_levels", 0)
+        yield "token", summary
+    else:
+        try:
+            print(f"Getting LLM with provider={provider}, model={model}")
+            llm = get_llm(provider=provider, model=model, temperature=temperature)
+            print("LLM initialized successfully")
+        except Exception as e:
+            raise RuntimeError(f"Failed to initialize LLM: {e}")
+
+        engine = MapReduceEngine(
+            SUMMARY_MAP_PROMPT | llm | StrOutputParser(),
+            SUMMARY_REDUCE_PROMPT | llm | StrOutputParser(),
+            max_concurrency=max_concurrency,
+            collapse_chain=SUMMARY_COLLAPSE_PROMPT | llm | StrOutputParser(),
+            reduce_mode=reduce_mode,
+            reduce_token_budget=plan["reduce_token_budget"],
+        )
+        phase = "map"
+        summary = ""
+        try:
+            for kind, payload in engine.stream(map_chunks):
+                if kind == "reduce":
+                    print(f"Map phase completed: {payload} summaries in {engine.timings['map_s']:.1f}s")
+                    phase = "reduce"
+                elif kind == "done":
+                    summary = payload["summary"]
+                    print(f"Reduce phase completed in {engine.timings['reduce_s']:.1f}s ({engine.reduce_levels} collapse levels)")
+                    continue
+                yield kind, payload
+        except Exception as e:
+            raise RuntimeError(f"Failed in {phase} phase: {e}")
+        timings, retries, reduce_levels = dict(engine.timings), engine.retries, engine.reduce_levels
+        if cache:
+            cache.put_summary(video_id, summary_key, {"summary": summary, "reduce_levels": reduce_levels})
 
     # 3) Vectorize
     try:
@@ -78,28 +182,61 @@ def process_youtube(url: str, provider: str = "auto", model: str = None, embeddi
         print("Embeddings initialized successfully")
     except Exception as e:
         raise RuntimeError(f"Failed to initialize embeddings: {e}")
-    
-    try:
-        docs = [Document(page_content=c) for c in chunks]
-        print(f"Created {len(docs)} documents")
-    except Exception as e:
-        raise RuntimeError(f"Failed to create documents: {e}")
-    
-    try:
-        print(f"Creating vector store in {persist_dir or '.chroma/video'}")
-        vect = Chroma.from_documents(docs, embedding=emb, persist_directory=persist_dir or ".chroma/video")
-        vect.persist()
-        print("Vector store created successfully")
-    except Exception as e:
-        raise RuntimeError(f"Failed to create vector store: {e}")
+    embedding_model = getattr(emb, "model_name", None) or getattr(emb, "model", "default")
+
+    if cache and cache.has_collection(video_id, embedding_model):
+        cached["vector"] = True
+        vect = LazyVectorStore(cache.collection_dir(video_id, embedding_model), emb)
+    else:
+        yield "status", "Building vector store..."
+        try:
+            docs = [Document(page_content=c) for c in chunks]
+            print(f"Created {len(docs)} documents")
+        except Exception as e:
+            raise RuntimeError(f"Failed to create documents: {e}")
 
-    return {
+        target = cache.collection_dir(video_id, embedding_model) if cache else (persist_dir or ".chroma/video")
+        try:
+            print(f"Creating vector store in {target}")
+            if cache:
+                with cache.lock(video_id):
+                    cache.clear_collection(video_id, embedding_model)  # leftovers of an interrupted build
+                    vect = Chroma.from_documents(docs, embedding=emb, persist_directory=target)
+                    vect.persist()
+                    cache.mark_collection(video_id, embedding_model, len(docs))
+            else:
+                vect = Chroma.from_documents(docs, embedding=emb, persist_directory=target)
+                vect.persist()
+            print("Vector store created successfully")
+        except Exception as e:
+            raise RuntimeError(f"Failed to create vector store: {e}")
+
+    yield "done", {
+        "video_id": video_id,
         "transcript_chars": len(transcript),
         "chunks": len(chunks),
+        "map_chunks": len(map_chunks),
+        "plan": plan,
+        "prefilter": filtered,
         "summary": summary,
+        "timings": timings,
+        "retries": retries,
+        "reduce_levels": reduce_levels,
+        "cached": cached,
         "vector": vect,
+        "embedding_cache": emb.summary() if isinstance(emb, CachedEmbeddings) else None,
     }
 
+def process_youtube(url: str, provider: str = "auto", model: str = None, embeddings_provider: str = None, temperature: float = 0.1, persist_dir: str = None,
+                    max_concurrency: int = DEFAULT_MAX_CONCURRENCY, reduce_mode: ReduceMode = "tree",
+                    cache: Optional[VideoCache] = video_cache,
+                    extractive_ratio: Optional[float] = DEFAULT_KEEP_RATIO) -> Dict[str, Any]:
+    return final_result(stream_youtube(
+        url, provider=provider, model=model, embeddings_provider=embeddings_provider, temperature=temperature,
+        persist_dir=persist_dir, max_concurrency=max_concurrency, reduce_mode=reduce_mode, cache=cache,
+        extractive_ratio=extractive_ratio,
+    ))
+
 def qa_over_documents(vect, question: str, provider: str = "auto", model: str = None, temperature: float = 0.1, k: int = 4) -> str:
     llm = get_llm(provider=provider, model=model, temperature=temperature)
     retr = vect.as_retriever(search_kwargs={"k": k})
@@ -1,17 +1,32 @@
+import atexit
 import os
-import io
-from typing import Optional
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+from typing import Any, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
+import numpy as np
 import whisper
 
-from elevenlabs.client import ElevenLabs
-from elevenlabs import VoiceSettings
+from src.utils.tts import ElevenLabsSynthesizer, stream_tts
+from src.utils.vad import FRAME_SECONDS, frame_energy, trim_silence
 
 load_dotenv()
 
-def transcribe_audio(audio_path: str, whisper_model: Optional[str] = None) -> str:
-    model_name = whisper_model or os.getenv("WHISPER_MODEL", "base")
-    
+WHISPER_SAMPLE_RATE = 16000
+
+_ffmpeg_ready = False
+
+def _ensure_ffmpeg() -> None:
+    """Put ffmpeg on PATH for Whisper's audio loader (checked once per process)."""
+    global _ffmpeg_ready
+    if _ffmpeg_ready:
+        return
+
     # Ensure ffmpeg is available for Whisper
     ffmpeg_loc = os.getenv("FFMPEG_LOCATION") or os.getenv("FFMPEG_PATH")
     
@@ -39,31 +54,303 @@ def transcribe_audio(audio_path: str, whisper_model: Optional[str] = None) -> st
         if ffmpeg_dir not in os.environ.get("PATH", ""):
             print(f"Adding ffmpeg to PATH: {ffmpeg_dir}")
             os.environ["PATH"] = f"{ffmpeg_dir};{os.environ.get('PATH', '')}"
+        _ffmpeg_ready = True
+    elif shutil.which("ffmpeg"):
+        _ffmpeg_ready = True
     else:
         print("WARNING: ffmpeg not found. Whisper transcription may fail.")
         print("Please set FFMPEG_LOCATION environment variable or enter it in the sidebar.")
-    
-    model = whisper.load_model(model_name)
-    result = model.transcribe(audio_path)
-    return result.get("text", "").strip()
-
-def tts_elevenlabs(text: str, voice: str = "Rachel") -> Optional[bytes]:
-    api_key = os.getenv("ELEVEN_LABS_API_KEY")
-    if not api_key:
-        return None
-    client = ElevenLabs(api_key=api_key)
-    # Newer SDK
-    audio = client.text_to_speech.convert(
-        voice_id=None,  # default voice for provided name is handled via settings or voices list
-        optimize_streaming_latency="0",
-        output_format="mp3_44100_128" ,
-        text=text,
-        voice_settings=VoiceSettings(stability=0.5, similarity_boost=0.8, style=0.0, use_speaker_boost=True),
-        model_id="eleven_multilingual_v2"
+
+class WhisperModelRegistry:
+    """Process-wide cache of loaded Whisper models.
+
+    Each model size is loaded once and shared by every caller. At most
+    `max_resident` models stay in memory; the least recently used one is
+    dropped when another size is loaded. Loading and transcription are
+    serialized per model (Whisper installs decoder hooks on the model while it
+    transcribes), while different models can load and run in parallel.
+    """
+
+    def __init__(self, max_resident: int = 2, device: Optional[str] = None):
+        self.max_resident = max(1, max_resident)
+        self.device = device
+        self._models: "OrderedDict[str, Any]" = OrderedDict()
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.load_times: Dict[str, float] = {}
+        self.stats = {"loads": 0, "hits": 0, "evictions": 0}
+
+    def model_lock(self, name: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(name, threading.Lock())
+
+    def get(self, name: str):
+        """Return the loaded model, loading it on first use."""
+        with self._lock:
+            if name in self._models:
+                self._models.move_to_end(name)
+                self.stats["hits"] += 1
+                return self._models[name]
+
+        # Load outside the registry lock so other sizes stay usable meanwhile
+        with self.model_lock(name):
+            with self._lock:
+                if name in self._models:  # loaded by another thread while we waited
+                    self._models.move_to_end(name)
+                    self.stats["hits"] += 1
+                    return self._models[name]
+            start = time.perf_counter()
+            model = whisper.load_model(name, device=self.device)
+            elapsed = time.perf_counter() - start
+            print(f"Loaded Whisper model '{name}' in {elapsed:.1f}s")
+
+            with self._lock:
+                self._models[name] = model
+                self.load_times[name] = elapsed
+                self.stats["loads"] += 1
+                while len(self._models) > self.max_resident:
+                    evicted, _ = self._models.popitem(last=False)
+                    self.stats["evictions"] += 1
+                    print(f"Unloaded Whisper model '{evicted}'")
+            return model
+
+    def warmup(self, names: Optional[List[str]] = None) -> None:
+        """Load models ahead of the first request and run one short decode on silence."""
+        _ensure_ffmpeg()
+        for name in names or [os.getenv("WHISPER_MODEL", "base")]:
+            model = self.get(name)
+            with self.model_lock(name):
+                model.transcribe(np.zeros(WHISPER_SAMPLE_RATE, dtype=np.float32), fp16=False)
+
+    def resident(self) -> List[str]:
+        with self._lock:
+            return list(self._models)
+
+whisper_registry = WhisperModelRegistry(max_resident=int(os.getenv("WHISPER_MAX_RESIDENT", "2")))
+
+# Long-audio mode: split at quiet points and transcribe segments in a process pool
+LONG_AUDIO_SECONDS = float(os.getenv("WHISPER_LONG_AUDIO_SECONDS", "600"))
+SEGMENT_SECONDS = float(os.getenv("WHISPER_SEGMENT_SECONDS", "120"))
+SPLIT_SEARCH_SECONDS = 15.0
+# Each worker holds its own model copy, so bigger models get fewer default workers
+MAX_DEFAULT_WORKERS = {"tiny": 4, "base": 4, "small": 3, "medium": 2}
+FALLBACK_MAX_WORKERS = 2  # large / turbo / unknown names
+
+def default_workers(model_name: str) -> int:
+    """WHISPER_WORKERS if set, else the core count capped by model size."""
+    configured = int(os.getenv("WHISPER_WORKERS", "0"))
+    if configured > 0:
+        return configured
+    cap = MAX_DEFAULT_WORKERS.get(model_name.split(".")[0], FALLBACK_MAX_WORKERS)
+    return max(1, min(os.cpu_count() or 1, cap))
+
+def split_on_silence(audio: np.ndarray, segment_s: float = SEGMENT_SECONDS,
+                     search_s: float = SPLIT_SEARCH_SECONDS) -> List[Tuple[int, int]]:
+    """Cut audio into ~`segment_s` pieces at the quietest frame near each target length.
+
+    Returns (start, end) sample offsets covering the whole input.
+    """
+    sr = WHISPER_SAMPLE_RATE
+    frame_len = int(FRAME_SECONDS * sr)
+    energy = frame_energy(audio, frame_len)
+    segment = int(segment_s * sr)
+    search = int(search_s * sr)
+
+    cuts = [0]
+    # Stop once the remainder is short enough to ride along with the last segment
+    while len(audio) - cuts[-1] > segment + segment // 4:
+        target = cuts[-1] + segment
+        lo = max(cuts[-1] + search, target - search) // frame_len
+        hi = min(len(energy), (target + search) // frame_len + 1)
+        quietest = lo + int(np.argmin(energy[lo:hi])) if hi > lo else target // frame_len
+        cuts.append(quietest * frame_len + frame_len // 2)
+    cuts.append(len(audio))
+    return list(zip(cuts[:-1], cuts[1:]))
+
+def _init_transcribe_worker(model_name: str, torch_threads: int) -> None:
+    import torch
+
+    # Workers share the cores; one BLAS pool per worker avoids oversubscription
+    torch.set_num_threads(torch_threads)
+    whisper_registry.get(model_name)
+
+def _run_whisper(model, audio: np.ndarray) -> Dict[str, Any]:
+    result = model.transcribe(audio)
+    return {
+        "text": result.get("text", "").strip(),
+        "segments": [
+            {"start": seg["start"], "end": seg["end"], "text": seg["text"]}
+            for seg in result.get("segments", [])
+        ],
+    }
+
+def _transcribe_segment(model_name: str, audio: np.ndarray) -> Dict[str, Any]:
+    return _run_whisper(whisper_registry.get(model_name), audio)
+
+_pools: "OrderedDict[str, Tuple[ProcessPoolExecutor, int]]" = OrderedDict()
+_pools_lock = threading.Lock()
+
+def _transcribe_pool(model_name: str, workers: int) -> ProcessPoolExecutor:
+    """Long-lived worker pool for one model, so workers load Whisper once, not once per call.
+
+    A pool is replaced when asked for a different worker count. Pools for at
+    most `whisper_registry.max_resident` models are kept; the least recently
+    used one is shut down.
+    """
+    with _pools_lock:
+        pool, size = _pools.pop(model_name, (None, 0))
+        if pool is not None and size != workers:
+            pool.shutdown(wait=False, cancel_futures=True)
+            pool = None
+        if pool is None:
+            torch_threads = max(1, (os.cpu_count() or 1) // workers)
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_transcribe_worker,
+                                       initargs=(model_name, torch_threads))
+        _pools[model_name] = (pool, workers)
+        while len(_pools) > whisper_registry.max_resident:
+            _, (evicted, _) = _pools.popitem(last=False)
+            evicted.shutdown(wait=False, cancel_futures=True)
+        return pool
+
+def _drop_pool(model_name: str) -> None:
+    with _pools_lock:
+        pool, _ = _pools.pop(model_name, (None, 0))
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def shutdown_transcribe_pools() -> None:
+    """Stop every worker pool (registered with atexit)."""
+    with _pools_lock:
+        pools = [pool for pool, _ in _pools.values()]
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+atexit.register(shutdown_transcribe_pools)
+
+def transcribe_parallel(audio: np.ndarray, model_name: str, workers: Optional[int] = None,
+                        segment_s: float = SEGMENT_SECONDS) -> Dict[str, Any]:
+    """Transcribe long audio as silence-split segments across a process pool.
+
+    The pool for `model_name` is kept between calls (see `_transcribe_pool`),
+    so each worker process loads the model only once. `workers` defaults to
+    `default_workers(model_name)`. Segment texts are stitched in order and
+    segment timestamps are shifted back onto the input timeline.
+    """
+    bounds = split_on_silence(audio, segment_s=segment_s)
+    workers = workers or default_workers(model_name)
+    pool = _transcribe_pool(model_name, workers)
+    try:
+        parts = list(pool.map(
+            _transcribe_segment, repeat(model_name), (audio[s:e] for s, e in bounds)
+        ))
+    except BrokenProcessPool:
+        # A worker died (e.g. out of memory); start a fresh pool next time
+        _drop_pool(model_name)
+        raise
+    workers = min(workers, len(bounds))
+
+    segments = []
+    for (offset, _), part in zip(bounds, parts):
+        offset_s = offset / WHISPER_SAMPLE_RATE
+        segments.extend(
+            {**seg, "start": seg["start"] + offset_s, "end": seg["end"] + offset_s}
+            for seg in part["segments"]
+        )
+    return {
+        "text": " ".join(part["text"] for part in parts if part["text"]),
+        "segments": segments,
+        "chunks": len(bounds),
+        "workers": workers,
+    }
+
+def transcribe_with_stats(audio_path: str, whisper_model: Optional[str] = None,
+                          long_audio: Optional[bool] = None, workers: Optional[int] = None,
+                          vad: Optional[bool] = None) -> Dict[str, Any]:
+    """Transcribe with the shared model and report timing.
+
+    With `vad` (default: WHISPER_VAD, on) non-speech stretches are cut out
+    before Whisper runs, and segment timestamps are mapped back onto the
+    original audio.
+
+    Audio of at least WHISPER_LONG_AUDIO_SECONDS (or any audio when
+    `long_audio=True`) goes through `transcribe_parallel` when more than one
+    worker is available; `long_audio=False` always uses the in-process model.
+
+    Returns the text, timestamped segments, audio duration, removed silence,
+    transcription time and real-time factor (transcription time / original
+    audio time; below 1.0 is faster than real time).
+    """
+    model_name = whisper_model or os.getenv("WHISPER_MODEL", "base")
+    workers = workers or default_workers(model_name)
+    if vad is None:
+        vad = os.getenv("WHISPER_VAD", "true").lower() != "false"
+    _ensure_ffmpeg()
+
+    audio = whisper.load_audio(audio_path)
+    audio_s = len(audio) / WHISPER_SAMPLE_RATE
+
+    timeline = None
+    vad_s = 0.0
+    if vad:
+        start = time.perf_counter()
+        timeline = trim_silence(audio, WHISPER_SAMPLE_RATE)
+        vad_s = time.perf_counter() - start
+        audio = timeline.audio
+        print(f"VAD removed {timeline.removed_s:.1f}s of {audio_s:.1f}s ({timeline.removed_ratio:.0%}) in {vad_s * 1000:.0f} ms")
+    speech_s = len(audio) / WHISPER_SAMPLE_RATE
+
+    if long_audio is None:
+        long_audio = speech_s >= LONG_AUDIO_SECONDS
+
+    if not len(audio):
+        start = time.perf_counter()
+        result = {"text": "", "segments": [], "chunks": 0, "workers": 0}
+    elif long_audio and workers > 1:
+        # Includes the workers' model loads, which run in parallel with each other
+        start = time.perf_counter()
+        result = transcribe_parallel(audio, model_name, workers=workers)
+    else:
+        model = whisper_registry.get(model_name)
+        start = time.perf_counter()
+        with whisper_registry.model_lock(model_name):
+            result = _run_whisper(model, audio)
+        result.update(chunks=1, workers=1)
+    transcribe_s = time.perf_counter() - start
+
+    if timeline is not None:
+        for seg in result["segments"]:
+            seg["start"] = timeline.to_original(seg["start"])
+            seg["end"] = timeline.to_original(seg["end"], end=True)
+
+    stats = {
+        **result,
+        "model": model_name,
+        "load_s": whisper_registry.load_times.get(model_name),
+        "audio_s": audio_s,
+        "speech_s": speech_s,
+        "vad_removed_s": audio_s - speech_s,
+        "vad_s": vad_s,
+        "transcribe_s": transcribe_s,
+        "rtf": transcribe_s / audio_s if audio_s else None,
+    }
+    print(
+        f"Transcribed {audio_s:.1f}s of audio in {transcribe_s:.1f}s (RTF {stats['rtf'] or 0:.2f}, model '{model_name}',"
+        f" {stats['chunks']} segment(s) on {stats['workers']} worker(s))"
     )
-    # Stream bytes to buffer
-    buf = io.BytesIO()
-    for chunk in audio:
-        if chunk:
-            buf.write(chunk)
-    return buf.getvalue()
\ No newline at end of file
+    return stats
+
+def transcribe_audio(audio_path: str, whisper_model: Optional[str] = None) -> str:
+    return transcribe_with_stats(audio_path, whisper_model)["text"]
+
+def tts_elevenlabs(text: str, voice: str = "Rachel", synthesizer=None) -> Optional[bytes]:
+    """Full answer audio, synthesized sentence by sentence in parallel (cached per sentence).
+
+    Pass `synthesizer` to use another TTS backend; see src.utils.tts.
+    """
+    if synthesizer is None:
+        api_key = os.getenv("ELEVEN_LABS_API_KEY")
+        if not api_key:
+            return None
+        synthesizer = ElevenLabsSynthesizer(api_key=api_key, voice=voice)
+    return b"".join(stream_tts(text, synthesizer))
@@ -0,0 +1,92 @@
+import re
+import zlib
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+NUM_PERM = 128
+BANDS = 32  # 32 bands x 4 rows: LSH threshold (1/32)^(1/4) ~ 0.42, so pairs at 0.7 share a band >99.9% of the time
+SHINGLE_WORDS = 5
+DEFAULT_THRESHOLD = 0.7
+
+_MAX_HASH = np.uint64(2 ** 64 - 1)
+_SEEDS = np.random.default_rng(1).integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+
+
+def _mix(z: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer: a cheap, well-scrambled 64-bit hash (uint64 math wraps)."""
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def shingles(text: str, size: int = SHINGLE_WORDS) -> np.ndarray:
+    """crc32 hashes (as uint64) of the distinct `size`-word shingles of lower-cased text."""
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < size:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64)
+
+
+def minhash(text: str) -> np.ndarray:
+    """MinHash signature: for each of NUM_PERM hash functions, the smallest shingle hash."""
+    hashes = shingles(text)
+    if not len(hashes):
+        return np.full(NUM_PERM, _MAX_HASH, dtype=np.uint64)
+    # One independent hash function per seed, applied to every shingle at once
+    return _mix(hashes[None, :] ^ _SEEDS[:, None]).min(axis=1)
+
+
+def cluster_near_duplicates(texts: List[str], threshold: float = DEFAULT_THRESHOLD) -> List[List[int]]:
+    """Group texts whose estimated Jaccard similarity is at least `threshold`.
+
+    Signatures are split into BANDS bands and hashed (LSH), so only texts
+    sharing a band are compared; the low band threshold catches nearly all
+    pairs at `threshold` and the signature comparison drops the false positives. Returns clusters of indices, each in input
+    order, ordered by their first member.
+    """
+    signatures = np.stack([minhash(t) for t in texts]) if texts else np.zeros((0, NUM_PERM), np.uint64)
+    parent = list(range(len(texts)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    rows = NUM_PERM // BANDS
+    for band in range(BANDS):
+        buckets: Dict[bytes, List[int]] = {}
+        for i, sig in enumerate(signatures[:, band * rows:(band + 1) * rows]):
+            buckets.setdefault(sig.tobytes(), []).append(i)
+        for members in buckets.values():
+            for n, j in enumerate(members[1:], start=1):
+                for i in members[:n]:
+                    a, b = find(i), find(j)
+                    if a != b and np.mean(signatures[i] == signatures[j]) >= threshold:
+                        parent[max(a, b)] = min(a, b)
+
+    clusters: Dict[int, List[int]] = {}
+    for i in range(len(texts)):
+        clusters.setdefault(find(i), []).append(i)
+    return sorted(clusters.values(), key=lambda c: c[0])
+
+
+def dedupe_articles(articles: List[Tuple[str, str]], threshold: float = DEFAULT_THRESHOLD) -> List[Dict[str, object]]:
+    """Collapse near-duplicate (url, text) articles, e.g. one wire story run by many outlets.
+
+    Returns one dict per cluster: the longest copy's "text", its "url", all
+    source "urls" in input order and the "dropped" texts of the other copies.
+    """
+    clusters = []
+    for members in cluster_near_duplicates([text for _, text in articles], threshold):
+        keep = max(members, key=lambda i: len(articles[i][1]))
+        clusters.append({
+            "url": articles[keep][0],
+            "text": articles[keep][1],
+            "urls": [articles[i][0] for i in members],
+            "dropped": [articles[i][1] for i in members if i != keep],
+        })
+    return clusters
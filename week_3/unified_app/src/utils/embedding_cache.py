@@ -0,0 +1,195 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+MIN_CAPACITY = 1024
+
+
+class CachedEmbeddings(Embeddings):
+    """Persistent embedding cache keyed by (embedding model, sha256 of text).
+
+    Vectors live in a float32 memory-mapped array, one row per cached text,
+    with a SQLite index mapping text hashes to rows. Least recently used rows
+    are evicted once `max_entries` is exceeded and their slots are reused, so
+    the vector file never grows past `max_entries` rows.
+    """
+
+    def __init__(self, underlying: Embeddings, model_name: str, cache_dir: str = ".cache/embeddings",
+                 max_entries: int = 200_000):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.underlying = underlying
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._lock = threading.Lock()
+
+        # One directory per model: vectors of different models never share a file
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        self.directory = os.path.join(cache_dir, slug)
+        os.makedirs(self.directory, exist_ok=True)
+        self._vectors_path = os.path.join(self.directory, "vectors.f32")
+
+        self._db = sqlite3.connect(os.path.join(self.directory, "index.sqlite"), check_same_thread=False)
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS entries (hash TEXT PRIMARY KEY, slot INTEGER NOT NULL, last_used REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+            CREATE TABLE IF NOT EXISTS free_slots (slot INTEGER PRIMARY KEY);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            """
+        )
+        self._dim = self._meta("dim")
+        self._next_slot = self._meta("next_slot") or 0
+        self._vectors: Optional[np.memmap] = None
+        if self._dim:
+            self._open_vectors(max(self._capacity_on_disk(), min(MIN_CAPACITY, max_entries)))
+
+    # ---------------- storage helpers ----------------
+    def _meta(self, key: str) -> Optional[int]:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: int) -> None:
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _capacity_on_disk(self) -> int:
+        if not os.path.exists(self._vectors_path):
+            return 0
+        return os.path.getsize(self._vectors_path) // (4 * self._dim)
+
+    def _open_vectors(self, capacity: int) -> None:
+        """(Re)map the vector file with room for `capacity` rows."""
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(self._vectors_path, "ab") as f:
+            f.truncate(capacity * self._dim * 4)
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self._dim))
+
+    def _allocate_slot(self) -> int:
+        row = self._db.execute("SELECT slot FROM free_slots LIMIT 1").fetchone()
+        if row:
+            self._db.execute("DELETE FROM free_slots WHERE slot = ?", row)
+            return row[0]
+        slot = self._next_slot
+        self._next_slot += 1
+        self._set_meta("next_slot", self._next_slot)
+        if slot >= self._vectors.shape[0]:
+            self._open_vectors(max(slot + 1, min(self._vectors.shape[0] * 2, self.max_entries)))
+        return slot
+
+    def _evict(self, incoming: int) -> None:
+        """Free least recently used rows so `incoming` new rows fit under the cap."""
+        count = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        excess = count + incoming - self.max_entries
+        if excess <= 0:
+            return
+        rows = self._db.execute(
+            "SELECT hash, slot FROM entries ORDER BY last_used LIMIT ?", (excess,)
+        ).fetchall()
+        self._db.executemany("DELETE FROM entries WHERE hash = ?", [(h,) for h, _ in rows])
+        self._db.executemany("INSERT OR IGNORE INTO free_slots (slot) VALUES (?)", [(s,) for _, s in rows])
+        self.stats["evictions"] += len(rows)
+
+    # ---------------- Embeddings interface ----------------
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [self._hash(t) for t in texts]
+        now = time.time()
+        found: Dict[str, List[float]] = {}
+
+        with self._lock:
+            if self._vectors is not None:
+                unique = list(dict.fromkeys(hashes))
+                for start in range(0, len(unique), 900):  # stay under SQLite's variable limit
+                    batch = unique[start:start + 900]
+                    rows = self._db.execute(
+                        f"SELECT hash, slot FROM entries WHERE hash IN ({','.join('?' * len(batch))})", batch
+                    ).fetchall()
+                    for h, slot in rows:
+                        found[h] = self._vectors[slot].tolist()
+                    self._db.executemany(
+                        "UPDATE entries SET last_used = ? WHERE hash = ?", [(now, h) for h, _ in rows]
+                    )
+                self._db.commit()
+
+        missing = {h: t for h, t in zip(hashes, texts) if h not in found}
+        self.stats["hits"] += len(texts) - len(missing)
+        self.stats["misses"] += len(missing)
+
+        if missing:
+            # Only the distinct uncached texts go to the embedding API
+            miss_hashes = list(missing)
+            vectors = self.underlying.embed_documents([missing[h] for h in miss_hashes])
+            with self._lock:
+                if self._vectors is None:
+                    self._dim = len(vectors[0])
+                    self._set_meta("dim", self._dim)
+                    self._open_vectors(min(MIN_CAPACITY, self.max_entries))
+                new = []
+                for h, vector in zip(miss_hashes, vectors):
+                    found[h] = list(vector)
+                    # Skip rows stored by a concurrent caller meanwhile
+                    if not self._db.execute("SELECT 1 FROM entries WHERE hash = ?", (h,)).fetchone():
+                        new.append((h, vector))
+                new = new[:self.max_entries]
+                self._evict(len(new))
+                for h, vector in new:
+                    slot = self._allocate_slot()
+                    self._vectors[slot] = np.asarray(vector, dtype=np.float32)
+                    self._db.execute(
+                        "INSERT INTO entries (hash, slot, last_used) VALUES (?, ?, ?)", (h, slot, now)
+                    )
+                self._vectors.flush()
+                self._db.commit()
+
+        return [found[h] for h in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    # ---------------- reporting ----------------
+    def hit_rate(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def size_bytes(self) -> int:
+        return os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+
+    def summary(self) -> Dict[str, float]:
+        return {**self.stats, "hit_rate": self.hit_rate(), "entries": len(self), "size_bytes": self.size_bytes()}
+
+
+_CACHES: Dict[tuple, CachedEmbeddings] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def cached_embeddings(underlying: Embeddings, model_name: str, cache_dir: Optional[str] = None,
+                      max_entries: Optional[int] = None) -> CachedEmbeddings:
+    """Return the process-wide cache for (cache_dir, model), wrapping `underlying`."""
+    cache_dir = cache_dir or os.getenv("EMBEDDINGS_CACHE_DIR", ".cache/embeddings")
+    max_entries = max_entries or int(os.getenv("EMBEDDINGS_CACHE_MAX_ENTRIES", "200000"))
+    key = (os.path.abspath(cache_dir), model_name)
+    with _CACHES_LOCK:
+        cache = _CACHES.get(key)
+        if cache is None:
+            cache = _CACHES[key] = CachedEmbeddings(underlying, model_name, cache_dir, max_entries)
+        else:
+            # Keep the shared index but call through the latest client (fresh key / base URL)
+            cache.underlying = underlying
+        return cache
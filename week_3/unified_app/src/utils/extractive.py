@@ -0,0 +1,128 @@
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, List, Literal, Optional
+
+import numpy as np
+
+from src.utils.text import count_tokens
+
+# Fraction of sentences kept before the map step; 0 / unset turns the prefilter off
+DEFAULT_KEEP_RATIO = float(os.getenv("SUMMARY_EXTRACTIVE_RATIO", "0")) or None
+# Caption transcripts have little punctuation, so long runs are cut into windows of this many words
+MAX_SENTENCE_WORDS = 40
+MIN_SENTENCES = 12  # shorter inputs are returned unchanged
+MAX_VOCAB = 4096
+MAX_TEXTRANK_SENTENCES = 3000  # above this the n x n similarity matrix gets too big; score by centroid
+REDUNDANT_SIM = 0.9
+
+Method = Literal["textrank", "tfidf"]
+
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+|\n+")
+_WORD = re.compile(r"\w+")
+
+
+def split_sentences(text: str) -> List[str]:
+    sentences = []
+    for part in _SENTENCE_END.split(text):
+        words = part.split()
+        for i in range(0, len(words), MAX_SENTENCE_WORDS):
+            sentences.append(" ".join(words[i:i + MAX_SENTENCE_WORDS]))
+    return sentences
+
+
+def tfidf_matrix(sentences: List[str]) -> np.ndarray:
+    """L2-normalised TF-IDF rows (float32), one per sentence.
+
+    Only terms found in at least two sentences are columns: a term unique to
+    one sentence adds nothing to any similarity. At most MAX_VOCAB columns.
+    """
+    docs = [Counter(_WORD.findall(s.lower())) for s in sentences]
+    df = Counter(term for doc in docs for term in doc)
+    vocab = [t for t, n in df.most_common(MAX_VOCAB) if n >= 2]
+    columns = {t: i for i, t in enumerate(vocab)}
+    idf = np.array([np.log((1 + len(docs)) / (1 + df[t])) + 1 for t in vocab], dtype=np.float32)
+
+    matrix = np.zeros((len(docs), len(vocab)), dtype=np.float32)
+    for row, doc in enumerate(docs):
+        for term, tf in doc.items():
+            col = columns.get(term)
+            if col is not None:
+                matrix[row, col] = 1 + np.log(tf)
+    matrix *= idf
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def textrank(similarity: np.ndarray, damping: float = 0.85, iterations: int = 50, tol: float = 1e-6) -> np.ndarray:
+    """PageRank over a sentence similarity graph (power iteration)."""
+    n = len(similarity)
+    weights = similarity.copy()
+    np.fill_diagonal(weights, 0.0)
+    out = weights.sum(axis=1, keepdims=True)
+    # Sentences sharing no terms with any other spread their rank uniformly
+    transition = np.where(out > 0, weights / np.maximum(out, 1e-12), 1.0 / n)
+    scores = np.full(n, 1.0 / n, dtype=np.float32)
+    for _ in range(iterations):
+        updated = (1 - damping) / n + damping * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < tol:
+            return updated
+        scores = updated
+    return scores
+
+
+def extract_key_sentences(text: str, keep_ratio: float, method: Method = "textrank") -> Dict[str, Any]:
+    """Keep the top-scoring `keep_ratio` of sentences, in their original order.
+
+    "textrank" ranks sentences by centrality in the TF-IDF cosine similarity
+    graph; "tfidf" by similarity to the document centroid (also used for very
+    long inputs). Off-topic stretches such as sponsor reads score low, and with
+    TextRank a sentence nearly identical to one already kept is skipped.
+
+    Returns the filtered "text" plus "sentences", "kept", "tokens_in",
+    "tokens_out" and "compression" (tokens_out / tokens_in).
+    """
+    sentences = split_sentences(text)
+    n = len(sentences)
+    keep = max(1, int(round(n * keep_ratio)))
+    result = text
+    if n >= MIN_SENTENCES and keep < n:
+        matrix = tfidf_matrix(sentences)
+        similarity = None
+        if method == "textrank" and n <= MAX_TEXTRANK_SENTENCES:
+            similarity = matrix @ matrix.T
+            scores = textrank(similarity)
+        else:
+            scores = matrix @ matrix.mean(axis=0)
+
+        chosen: List[int] = []
+        for i in np.argsort(-scores, kind="stable"):
+            if len(chosen) == keep:
+                break
+            if similarity is not None and chosen and similarity[i, chosen].max() >= REDUNDANT_SIM:
+                continue
+            chosen.append(int(i))
+        result = " ".join(sentences[i] for i in sorted(chosen))
+        keep = len(chosen)
+    else:
+        keep = n
+
+    tokens_in, tokens_out = count_tokens(text), count_tokens(result)
+    return {
+        "text": result,
+        "sentences": n,
+        "kept": keep,
+        "tokens_in": tokens_in,
+        "tokens_out": tokens_out,
+        "compression": tokens_out / tokens_in if tokens_in else 1.0,
+    }
+
+
+def prefilter(text: str, keep_ratio: Optional[float]) -> Optional[Dict[str, Any]]:
+    """`extract_key_sentences` when `keep_ratio` is set (0 < ratio < 1), else None."""
+    if not keep_ratio or keep_ratio >= 1:
+        return None
+    stats = extract_key_sentences(text, keep_ratio)
+    print(f"Extractive prefilter kept {stats['kept']}/{stats['sentences']} sentences, "
+          f"{stats['tokens_in']} -> {stats['tokens_out']} tokens ({stats['compression']:.0%})")
+    return stats
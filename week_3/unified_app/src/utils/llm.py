@@ -1,6 +1,6 @@
 import os
 import ssl
-from typing import Literal, Optional
+from typing import Literal, Optional, Tuple
 
 from dotenv import load_dotenv
 
@@ -8,6 +8,8 @@ from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_groq import ChatGroq
 
+from src.utils.embedding_cache import cached_embeddings
+
 load_dotenv()
 
 # Optional SSL relax (dev only)
@@ -20,6 +22,27 @@ if os.getenv("SSL_VERIFY", "true").lower() == "false":
 Provider = Literal["openai", "groq", "aimlapi", "auto"]
 EmbProvider = Literal["openai"]
 
+DEFAULT_MODELS = {"openai": "gpt-4o-mini", "groq": "llama-3.3-70b-versatile", "aimlapi": "gpt-4o-mini"}
+
+# (context window, max output tokens) of the models offered in the app
+MODEL_LIMITS = {
+    "gpt-4o-mini": (128_000, 16_384),
+    "gpt-4o": (128_000, 16_384),
+    "gpt-4-turbo": (128_000, 4_096),
+    "gpt-3.5-turbo": (16_385, 4_096),
+    "gpt-5": (400_000, 128_000),
+    "llama-3.3-70b-versatile": (128_000, 32_768),
+    "llama-3.1-70b-versatile": (128_000, 8_000),
+    "llama-3.1-8b-instant": (128_000, 8_000),
+    "mixtral-8x7b-32768": (32_768, 4_096),
+    "gemma2-9b-it": (8_192, 4_096),
+    "claude-3-5-sonnet-20241022": (200_000, 8_192),
+    "meta-llama/Llama-3.2-90B-Vision-Instruct-Turbo": (128_000, 4_096),
+    "mistralai/Mistral-7B-Instruct-v0.3": (32_768, 4_096),
+}
+# Unknown (custom) models get a conservative window; MODEL_CONTEXT_TOKENS / MODEL_OUTPUT_TOKENS override both
+DEFAULT_MODEL_LIMITS = (8_192, 2_048)
+
 def get_llm(provider: Provider = "auto",
             model: Optional[str] = None,
             temperature: float = 0.1,
@@ -40,6 +63,8 @@ def get_llm(provider: Provider = "auto",
     if provider == "auto":
         provider = "openai"
 
+    model = model or DEFAULT_MODELS.get(provider)
+
     if provider == "openai":
         openai_key = api_key or os.getenv("OPENAI_API_KEY", "").strip()
         if not openai_key:
@@ -47,7 +72,7 @@ def get_llm(provider: Provider = "auto",
         
         return ChatOpenAI(
             api_key=openai_key,
-            model=model or "gpt-4o-mini",
+            model=model,
             temperature=temperature,
             timeout=120,
         )
@@ -59,7 +84,7 @@ def get_llm(provider: Provider = "auto",
         
         return ChatGroq(
             api_key=groq_key,
-            model=model or "llama-3.3-70b-versatile",
+            model=model,
             temperature=temperature,
             timeout=120,
         )
@@ -72,14 +97,33 @@ def get_llm(provider: Provider = "auto",
         return ChatOpenAI(
             api_key=aimlapi_key,
             base_url="https://api.aimlapi.com/v1",
-            model=model or "gpt-4o-mini",
+            model=model,
             temperature=temperature,
             timeout=120,
         )
 
     raise ValueError(f"Unknown provider: {provider}")
 
-def get_embeddings(provider: EmbProvider = None, model: Optional[str] = None):
+def model_limits(provider: Provider = "auto", model: Optional[str] = None) -> Tuple[int, int]:
+    """(context window, max output tokens) for the model `get_llm` would use."""
+    if provider == "auto":
+        provider = "openai"
+    model = model or DEFAULT_MODELS.get(provider)
+    if model in MODEL_LIMITS:
+        context, output = MODEL_LIMITS[model]
+    else:
+        context, output = DEFAULT_MODEL_LIMITS
+        if not os.getenv("MODEL_CONTEXT_TOKENS"):
+            print(f"Unknown context window for model '{model}'; assuming {context} tokens "
+                  f"(set MODEL_CONTEXT_TOKENS / MODEL_OUTPUT_TOKENS to override)")
+    return (int(os.getenv("MODEL_CONTEXT_TOKENS", context)), int(os.getenv("MODEL_OUTPUT_TOKENS", output)))
+
+def get_embeddings(provider: EmbProvider = None, model: Optional[str] = None, cache: Optional[bool] = None):
+    """Return the embeddings client, wrapped in the shared on-disk embedding cache.
+
+    The cache is on unless `cache=False` or EMBEDDINGS_CACHE=false; its location
+    and size cap come from EMBEDDINGS_CACHE_DIR and EMBEDDINGS_CACHE_MAX_ENTRIES.
+    """
     provider = provider or os.getenv("EMBEDDINGS_PROVIDER", "openai")  # type: ignore
     if provider != "openai":
         raise ValueError("Only the OpenAI embeddings provider is supported. Set EMBEDDINGS_PROVIDER=openai.")
@@ -88,8 +132,12 @@ def get_embeddings(provider: EmbProvider = None, model: Optional[str] = None):
     if not openai_key:
         raise ValueError("OPENAI_API_KEY is required for embeddings when using the OpenAI/AIMLAPI provider.")
 
-    return OpenAIEmbeddings(
+    model = model or os.getenv("EMBEDDINGS_MODEL", "text-embedding-3-small")
+    embeddings = OpenAIEmbeddings(
         api_key=openai_key,
         base_url=os.getenv("OPENAI_BASE_URL") or None,
-        model=model or os.getenv("EMBEDDINGS_MODEL", "text-embedding-3-small"),
-    )
\ No newline at end of file
+        model=model,
+    )
+    if cache is None:
+        cache = os.getenv("EMBEDDINGS_CACHE", "true").lower() != "false"
+    return cached_embeddings(embeddings, model) if cache else embeddings
@@ -1,22 +1,315 @@
-from typing import Optional
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
 import trafilatura
 from newspaper import Article
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-def fetch_article(url: str) -> Optional[str]:
-    """Try Trafilatura first, fallback to newspaper3k."""
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+DEFAULT_MAX_WORKERS = int(os.getenv("NEWS_FETCH_WORKERS", "16"))
+DEFAULT_PER_HOST = int(os.getenv("NEWS_FETCH_PER_HOST", "2"))
+MIN_TEXT_CHARS = 300
+
+
+class HtmlCache:
+    """Raw HTML on disk, keyed by URL, with the validators needed to revalidate it.
+
+    Each page is `<sha256(url)>.html` plus a `.json` sidecar holding the URL,
+    ETag, Last-Modified, fetch time, last access and size. Least recently used
+    pages are evicted past `max_bytes`; sizes and access times are kept in an
+    in-memory index (rebuilt from the sidecars once), so a write does not list
+    the whole directory.
+    """
+
+    def __init__(self, root: str = ".cache/html", max_bytes: int = 500 * 1024 ** 2, fresh_s: float = 600):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.fresh_s = fresh_s
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, List[float]]] = None  # key -> [last access, size in bytes]
+        self._total = 0
+
+    def _key(self, url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _path(self, url: str, ext: str) -> str:
+        return os.path.join(self.root, self._key(url) + ext)
+
+    def _load_index(self) -> Dict[str, List[float]]:
+        """Build the index from disk on first use (caller holds the lock)."""
+        if self._index is None:
+            self._index, self._total = {}, 0
+            names = os.listdir(self.root) if os.path.isdir(self.root) else []
+            for name in names:
+                if not name.endswith(".html"):
+                    continue
+                key = name[:-len(".html")]
+                try:
+                    size = os.path.getsize(os.path.join(self.root, name))
+                    with open(os.path.join(self.root, key + ".json"), "r", encoding="utf-8") as f:
+                        meta = json.load(f)
+                except (OSError, ValueError):
+                    meta = {}
+                accessed = meta.get("accessed", meta.get("fetched", 0))
+                self._index[key] = [accessed, size]
+                self._total += size
+        return self._index
+
+    def _record(self, key: str, size: Optional[int] = None) -> None:
+        """Mark a page as used now, optionally with its new size, then evict if over budget."""
+        with self._lock:
+            index = self._load_index()
+            entry = index.setdefault(key, [0.0, 0])
+            if size is not None:
+                self._total += size - entry[1]
+                entry[1] = size
+            entry[0] = time.time()
+            if self._total > self.max_bytes:
+                self._evict(index)
+
+    def _meta(self, url: str) -> Dict[str, Any]:
+        """The page's sidecar, or {} if there is none."""
+        try:
+            with open(self._path(url, ".json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, url: str) -> Tuple[Optional[str], Dict[str, Any]]:
+        """Cached HTML and its metadata, or (None, {}) if the page is not cached."""
+        meta = self._meta(url)
+        if not meta:
+            return None, {}
+        try:
+            with open(self._path(url, ".html"), "r", encoding="utf-8") as f:
+                html = f.read()
+        except (OSError, ValueError):
+            return None, {}
+        self._record(self._key(url))
+        return html, meta
+
+    def is_fresh(self, meta: Dict[str, Any]) -> bool:
+        return time.time() - meta.get("fetched", 0) < self.fresh_s
+
+    def put(self, url: str, html: str, etag: Optional[str], last_modified: Optional[str]) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        suffix = f".{threading.get_ident()}.tmp"
+        html_path = self._path(url, ".html")
+        data = html.encode("utf-8")
+        with open(html_path + suffix, "wb") as f:
+            f.write(data)
+        os.replace(html_path + suffix, html_path)
+        self.touch(url, etag=etag, last_modified=last_modified, size=len(data))
+
+    def touch(self, url: str, **fields: Any) -> None:
+        """Record a (re)validation: the cached copy counts as fetched, and used, now."""
+        meta = self._meta(url)
+        now = time.time()
+        meta.update({k: v for k, v in fields.items() if v is not None}, url=url, fetched=now, accessed=now)
+        path = self._path(url, ".json")
+        with open(path + f".{threading.get_ident()}.tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(path + f".{threading.get_ident()}.tmp", path)
+        self._record(self._key(url), fields.get("size"))
+
+    def _evict(self, index: Dict[str, List[float]]) -> None:
+        """Drop least recently used pages until under `max_bytes` (caller holds the lock)."""
+        for key in sorted(index, key=lambda k: index[k][0]):
+            if self._total <= self.max_bytes:
+                break
+            for ext in (".html", ".json"):
+                try:
+                    os.remove(os.path.join(self.root, key + ext))
+                except OSError:
+                    pass
+            self._total -= index.pop(key)[1]
+
+
+html_cache = HtmlCache(
+    root=os.getenv("NEWS_HTML_CACHE_DIR", ".cache/html"),
+    max_bytes=int(float(os.getenv("NEWS_HTML_CACHE_MAX_MB", "500")) * 1024 ** 2),
+    fresh_s=float(os.getenv("NEWS_HTML_CACHE_FRESH_S", "600")),
+)
+
+
+def extract_text(html: str, url: str) -> Optional[str]:
+    """Article text from already-downloaded HTML: Trafilatura first, newspaper3k as fallback."""
     try:
-        downloaded = trafilatura.fetch_url(url)
-        if downloaded:
-            text = trafilatura.extract(downloaded, include_comments=False, include_tables=False)
-            if text and len(text.strip()) > 300:
-                return text
+        text = trafilatura.extract(html, url=url, include_comments=False, include_tables=False)
+        if text and len(text.strip()) > MIN_TEXT_CHARS:
+            return text
     except Exception:
         pass
 
     try:
         art = Article(url)
-        art.download()
+        art.download(input_html=html)  # parse the same HTML, no second download
         art.parse()
-        return art.text
+        return art.text or None
     except Exception:
-        return None
\ No newline at end of file
+        return None
+
+
+def _host(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+
+class ArticleFetcher:
+    """Fetches article pages over one pooled HTTP session.
+
+    At most `max_workers` requests are in flight overall and at most
+    `per_host` against any single host, so a digest full of links to one
+    site does not hammer it. Pages are cached on disk: within `fresh_s` of
+    the last fetch the cached copy is used as is, after that it is
+    revalidated with If-None-Match / If-Modified-Since and a 304 reuses it.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS, per_host: int = DEFAULT_PER_HOST,
+                 cache: Optional[HtmlCache] = html_cache, timeout: float = 15.0):
+        self.max_workers = max(1, max_workers)
+        self.per_host = max(1, per_host)
+        self.cache = cache
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        self.session.verify = os.getenv("SSL_VERIFY", "true").lower() != "false"
+        retry = Retry(total=2, backoff_factor=0.5, status_forcelist=(429, 502, 503, 504),
+                      allowed_methods=("GET",), respect_retry_after_header=True)
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.stats = {"fresh": 0, "not_modified": 0, "downloaded": 0, "stale": 0, "failed": 0}
+        self._hosts: Dict[str, threading.Semaphore] = {}
+        self._lock = threading.Lock()
+
+    def _host_slot(self, url: str) -> threading.Semaphore:
+        host = _host(url)
+        with self._lock:
+            return self._hosts.setdefault(host, threading.BoundedSemaphore(self.per_host))
+
+    def _count(self, outcome: str) -> None:
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def fetch_html(self, url: str) -> Optional[str]:
+        cached, meta = self.cache.get(url) if self.cache else (None, {})
+        if cached is not None and self.cache.is_fresh(meta):
+            self._count("fresh")
+            return cached
+
+        headers = {}
+        if cached is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        try:
+            with self._host_slot(url):
+                resp = self.session.get(url, headers=headers, timeout=self.timeout)
+            if resp.status_code == 304 and cached is not None:
+                self.cache.touch(url)
+                self._count("not_modified")
+                return cached
+            resp.raise_for_status()
+            if "charset" not in resp.headers.get("Content-Type", "").lower():
+                # requests falls back to ISO-8859-1 for text/html without a charset
+                resp.encoding = resp.apparent_encoding
+            html = resp.text
+        except Exception as e:
+            if cached is not None:
+                # Serve the old copy rather than nothing when the site is down
+                self._count("stale")
+                return cached
+            print(f"Fetch failed for {url}: {e}")
+            self._count("failed")
+            return None
+
+        if self.cache:
+            self.cache.put(url, html, resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+        self._count("downloaded")
+        return html
+
+    def fetch(self, url: str) -> Optional[str]:
+        """Article text for one URL, or None if it could not be fetched or extracted."""
+        html = self.fetch_html(url)
+        return extract_text(html, url) if html else None
+
+    def iter_fetch(self, urls: List[str]) -> Iterator[Tuple[int, Optional[str]]]:
+        """Yield (url index, article text or None) as each page completes.
+
+        URLs are queued per host and submitted only while their host has a
+        free slot, so a run of links to one site does not tie up the workers
+        while pages on other hosts wait behind it.
+        """
+        queues: Dict[str, Deque[int]] = {}
+        for i, url in enumerate(urls):
+            queues.setdefault(_host(url), deque()).append(i)
+        in_flight: Dict[str, int] = dict.fromkeys(queues, 0)
+        futures: Dict[Future, Tuple[int, str]] = {}
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(urls) or 1)) as pool:
+            def submit_ready() -> None:
+                # Round-robin over hosts with queued URLs and a free slot
+                submitted = True
+                while submitted and len(futures) < self.max_workers:
+                    submitted = False
+                    for host, pending in queues.items():
+                        if pending and in_flight[host] < self.per_host and len(futures) < self.max_workers:
+                            i = pending.popleft()
+                            in_flight[host] += 1
+                            futures[pool.submit(self.fetch, urls[i])] = (i, host)
+                            submitted = True
+
+            try:
+                submit_ready()
+                while futures:
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    finished = []
+                    for future in done:
+                        i, host = futures.pop(future)
+                        in_flight[host] -= 1
+                        finished.append((i, future))
+                    submit_ready()  # refill before handing results to the caller
+                    for i, future in finished:
+                        yield i, future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def fetch_many(self, urls: List[str]) -> List[Optional[str]]:
+        """Article texts in URL order."""
+        texts: List[Optional[str]] = [None] * len(urls)
+        for i, text in self.iter_fetch(urls):
+            texts[i] = text
+        return texts
+
+
+_default_fetcher: Optional[ArticleFetcher] = None
+_default_fetcher_lock = threading.Lock()
+
+
+def _fetcher() -> ArticleFetcher:
+    global _default_fetcher
+    with _default_fetcher_lock:
+        if _default_fetcher is None:
+            _default_fetcher = ArticleFetcher()
+        return _default_fetcher
+
+
+def fetch_article(url: str) -> Optional[str]:
+    """Fetch one article (cached), extract with Trafilatura, fallback to newspaper3k."""
+    return _fetcher().fetch(url)
+
+
+def fetch_articles(urls: List[str]) -> List[Optional[str]]:
+    """Fetch many articles concurrently on the shared session; texts come back in URL order."""
+    return _fetcher().fetch_many(urls)
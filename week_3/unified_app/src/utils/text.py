@@ -1,10 +1,137 @@
-from typing import List
+import math
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+try:
+    import tiktoken
+
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # encoding files not cached and no network
+    _encoding = None
+
+def count_tokens(text: str) -> int:
+    """Token count with tiktoken's cl100k_base, or ~4 characters per token without it."""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return max(1, len(text) // 4)
+
 def chunk_text(text: str, chunk_size: int = 1000, chunk_overlap: int = 150) -> List[str]:
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
         separators=["\n\n", "\n", ". ", ", ", " "]
     )
-    return [c.page_content for c in splitter.create_documents([text])]
\ No newline at end of file
+    return [c.page_content for c in splitter.create_documents([text])]
+
+# Tokens reserved per call for the system prompt, template text and chat formatting
+PROMPT_OVERHEAD_TOKENS = 200
+# Output reserved per map call (a few bullets) and for the reduce / collapse calls
+MAP_OUTPUT_TOKENS = 512
+REDUCE_OUTPUT_TOKENS = 2048
+
+def _split_oversized(chunks: List[str], sizes: List[int], budget: int,
+                     token_counter: Callable[[str], int]) -> Tuple[List[str], List[int]]:
+    """Re-split every chunk over `budget` tokens; raise if a piece still cannot fit."""
+    fitted, fitted_sizes = [], []
+    for chunk, size in zip(chunks, sizes):
+        pieces, piece_sizes = [chunk], [size]
+        for _ in range(4):
+            if max(piece_sizes) <= budget:
+                break
+            # Shrink the character size by how far the worst piece overshoots
+            chunk_size = max(1, int(len(chunk) * budget / max(piece_sizes) * 0.9))
+            pieces = chunk_text(chunk, chunk_size=chunk_size, chunk_overlap=0)
+            piece_sizes = [token_counter(p) for p in pieces]
+        if max(piece_sizes) > budget:
+            raise ValueError(f"Could not split the text into chunks of at most {budget} tokens "
+                             f"(a piece has {max(piece_sizes)}); it may contain a very long unbroken run")
+        fitted.extend(pieces)
+        fitted_sizes.extend(piece_sizes)
+    return fitted, fitted_sizes
+
+def plan_chunks(text: str, context_tokens: int, output_tokens: int, token_counter: Callable[[str], int] = count_tokens,
+                prompt_tokens: int = PROMPT_OVERHEAD_TOKENS, overlap_ratio: float = 0.1,
+                max_chunk_tokens: Optional[int] = None, safety: float = 0.9,
+                max_reduce_depth: int = 5) -> Dict[str, Any]:
+    """Chunk `text` for map-reduce with as few LLM calls as the model's limits allow.
+
+    Each map call gets at most `safety` x (context window - prompt - reserved
+    map output) tokens of text, or `max_chunk_tokens` if smaller. The text is
+    split into the fewest evenly sized chunks under that budget, with
+    `overlap_ratio` overlap. Token counts are converted to a character
+    `chunk_size` for `chunk_text`; if a dense stretch overshoots the budget the
+    split is redone with more chunks, and any chunk still over it is split on
+    its own. Raises ValueError if some piece cannot be brought under budget.
+
+    A single chunk that also fits the reduce budget is "direct": it goes
+    straight to the reduce prompt and no map call is made (see
+    MapReduceEngine.stream).
+
+    Returns the "chunks" plus the plan: "chunk_size" / "chunk_overlap"
+    (characters), "chunk_tokens" (largest chunk), "token_budget", "text_tokens",
+    "direct", "map_calls", "reduce_calls", "calls", "input_tokens",
+    "output_tokens" and the "reduce_token_budget" to give MapReduceEngine. Map
+    figures are exact; reduce figures are upper bounds that assume every map
+    output fills its MAP_OUTPUT_TOKENS reservation.
+    """
+    map_output = min(MAP_OUTPUT_TOKENS, output_tokens)
+    reduce_output = min(REDUCE_OUTPUT_TOKENS, output_tokens)
+    budget = int((context_tokens - prompt_tokens - map_output) * safety)
+    if max_chunk_tokens:
+        budget = min(budget, max_chunk_tokens)
+    reduce_budget = int((context_tokens - prompt_tokens - reduce_output) * safety)
+    if budget <= 0 or reduce_budget <= 0:
+        raise ValueError(f"A {context_tokens}-token context window leaves no room for input")
+
+    total = token_counter(text)
+    chunk_size = chunk_overlap = len(text)
+    if total <= budget:
+        chunks, sizes = ([text], [total]) if text.strip() else ([], [])
+    else:
+        chars_per_token = len(text) / total
+        # n chunks of s tokens overlapping by r*s cover n*s - (n-1)*r*s tokens
+        calls = math.ceil((total / budget - overlap_ratio) / (1 - overlap_ratio))
+        for _ in range(8):
+            target = total / (calls - (calls - 1) * overlap_ratio)
+            # The splitter packs pieces greedily below chunk_size, so leave some slack up to the budget
+            chunk_size = max(1, int(min(target * 1.1, budget) * chars_per_token))
+            chunk_overlap = int(target * overlap_ratio * chars_per_token)
+            chunks = chunk_text(text, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+            sizes = [token_counter(c) for c in chunks]
+            if max(sizes) <= budget:
+                break
+            calls += max(1, calls // 4)
+        else:
+            # Still over after all passes (e.g. one very dense stretch): split just the oversized chunks
+            chunks, sizes = _split_oversized(chunks, sizes, budget, token_counter)
+
+    direct = len(chunks) == 1 and sizes[0] <= reduce_budget
+    map_calls = 0 if direct else len(chunks)
+
+    # Estimate the reduce like MapReduceEngine.collapse: batches of points until one call fits
+    reduce_calls, reduce_input, points, depth = 1, 0, len(chunks), 0
+    while points > 1 and points * map_output > reduce_budget and depth < max_reduce_depth:
+        depth += 1
+        batches = math.ceil(points * map_output / reduce_budget)
+        reduce_calls += batches
+        reduce_input += points * map_output + batches * prompt_tokens
+        points = batches
+    reduce_input += (sizes[0] if direct else points * map_output) + prompt_tokens
+
+    return {
+        "chunks": chunks,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "chunk_tokens": max(sizes, default=0),
+        "token_budget": budget,
+        "text_tokens": total,
+        "direct": direct,
+        "map_calls": map_calls,
+        "reduce_calls": reduce_calls,
+        "calls": map_calls + reduce_calls,
+        "input_tokens": (0 if direct else sum(sizes) + map_calls * prompt_tokens) + reduce_input,
+        "output_tokens": map_calls * map_output + reduce_calls * reduce_output,
+        "reduce_token_budget": reduce_budget,
+    }
@@ -0,0 +1,199 @@
+import hashlib
+import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Deque, Iterable, Iterator, Optional, Union
+
+from elevenlabs import VoiceSettings
+from elevenlabs.client import ElevenLabs
+
+# Premade ElevenLabs voices by name; any other value is used as a voice id
+VOICE_IDS = {"Rachel": "21m00Tcm4TlvDq8ikWAM"}
+
+# A sentence ends at terminal punctuation followed by whitespace, or at a newline
+SENTENCE_END = re.compile(r"[.!?…][\"')\]]*\s+|\n+")
+
+
+class ElevenLabsSynthesizer:
+    """Synthesizes one piece of text per call with the ElevenLabs API.
+
+    Any object with `synthesize(text) -> bytes` (and optionally a
+    `cache_namespace` string) can replace it, e.g. a local stub in tests.
+    """
+
+    def __init__(self, api_key: str, voice: str = "Rachel", model_id: str = "eleven_multilingual_v2",
+                 output_format: str = "mp3_44100_128"):
+        self.client = ElevenLabs(api_key=api_key)
+        self.voice_id = os.getenv("ELEVEN_LABS_VOICE_ID") or VOICE_IDS.get(voice, voice)
+        self.model_id = model_id
+        self.output_format = output_format
+
+    @property
+    def cache_namespace(self) -> str:
+        return f"elevenlabs|{self.voice_id}|{self.model_id}|{self.output_format}"
+
+    def synthesize(self, text: str) -> bytes:
+        audio = self.client.text_to_speech.convert(
+            voice_id=self.voice_id,
+            optimize_streaming_latency="0",
+            output_format=self.output_format,
+            text=text,
+            voice_settings=VoiceSettings(stability=0.5, similarity_boost=0.8, style=0.0, use_speaker_boost=True),
+            model_id=self.model_id,
+        )
+        return b"".join(chunk for chunk in audio if chunk)
+
+
+class AudioCache:
+    """Content-addressed audio clips on disk, least recently used evicted past `max_bytes`."""
+
+    def __init__(self, root: str = ".cache/tts", max_bytes: int = 200 * 1024 ** 2):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(namespace: str, text: str) -> str:
+        return hashlib.sha256(f"{namespace}\0{text}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.audio")
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            self.stats["misses"] += 1
+            return None
+        os.utime(path)  # mtime doubles as last access for eviction
+        self.stats["hits"] += 1
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self._evict()
+
+    def _evict(self) -> None:
+        with self._lock:
+            files = []
+            for name in os.listdir(self.root):
+                if name.endswith(".audio"):
+                    stat = os.stat(os.path.join(self.root, name))
+                    files.append((stat.st_mtime, stat.st_size, name))
+            total = sum(size for _, size, _ in files)
+            for _, size, name in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.root, name))
+                    total -= size
+                except OSError:
+                    pass
+
+
+tts_cache = AudioCache(
+    root=os.getenv("TTS_CACHE_DIR", ".cache/tts"),
+    max_bytes=int(float(os.getenv("TTS_CACHE_MAX_MB", "200")) * 1024 ** 2),
+)
+
+
+class SpeechPipeline:
+    """Sentence-pipelined text-to-speech.
+
+    Text is fed in as it arrives (e.g. LLM tokens). Each completed sentence is
+    synthesized right away on a small thread pool, so synthesis overlaps both
+    generation and the other sentences. Audio comes out in sentence order:
+    `ready()` returns what is already finished without blocking, iterating
+    the pipeline waits for the rest. Clips are cached by content hash.
+    """
+
+    def __init__(self, synthesizer, max_workers: int = 3, cache: Optional[AudioCache] = tts_cache,
+                 min_chars: int = 20):
+        self.synthesizer = synthesizer
+        self.cache = cache
+        self.min_chars = min_chars
+        self.namespace = getattr(synthesizer, "cache_namespace", type(synthesizer).__name__)
+        self.sentences = 0
+        self._buffer = ""
+        self._closed = False
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._pending: Deque[Future] = deque()
+
+    def _synthesize(self, sentence: str) -> bytes:
+        key = AudioCache.key(self.namespace, sentence) if self.cache else None
+        if key:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        audio = self.synthesizer.synthesize(sentence)
+        if key:
+            self.cache.put(key, audio)
+        return audio
+
+    def _submit(self, sentence: str) -> None:
+        sentence = sentence.strip()
+        if sentence:
+            self.sentences += 1
+            self._pending.append(self._pool.submit(self._synthesize, sentence))
+
+    def feed(self, text: str) -> None:
+        """Add text; every sentence completed by it is sent for synthesis."""
+        self._buffer += text
+        while True:
+            # Boundaries inside the first `min_chars` are skipped so tiny fragments ride along
+            match = SENTENCE_END.search(self._buffer, self.min_chars)
+            if not match:
+                return
+            self._submit(self._buffer[:match.end()])
+            self._buffer = self._buffer[match.end():]
+
+    def close(self) -> None:
+        """Flush the trailing partial sentence; no more text will be fed."""
+        if not self._closed:
+            self._closed = True
+            self._submit(self._buffer)
+            self._buffer = ""
+
+    def ready(self) -> Iterator[bytes]:
+        """Audio for the next sentences in order, as far as it is already synthesized."""
+        while self._pending and self._pending[0].done():
+            yield self._pending.popleft().result()
+
+    def __iter__(self) -> Iterator[bytes]:
+        self.close()
+        try:
+            while self._pending:
+                yield self._pending.popleft().result()
+        finally:
+            self.shutdown()
+
+    def shutdown(self) -> None:
+        """Cancel sentences not yet started and release the thread pool (safe to call twice)."""
+        self._closed = True
+        while self._pending:
+            self._pending.popleft().cancel()
+        self._pool.shutdown(wait=False)
+
+
+def stream_tts(text: Union[str, Iterable[str]], synthesizer, max_workers: int = 3,
+               cache: Optional[AudioCache] = tts_cache) -> Iterator[bytes]:
+    """Yield audio clips sentence by sentence for a full text or a stream of text deltas."""
+    pipeline = SpeechPipeline(synthesizer, max_workers=max_workers, cache=cache)
+    try:
+        for delta in [text] if isinstance(text, str) else text:
+            pipeline.feed(delta)
+            yield from pipeline.ready()
+        yield from pipeline
+    finally:
+        # Also runs when the text iterator or a synthesis raises, or the caller stops early
+        pipeline.shutdown()
@@ -0,0 +1,92 @@
+from typing import List, Tuple
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.03
+# Frames quieter than this (dBFS) are never speech, whatever the noise floor
+SILENCE_DB = -60.0
+
+def frame_energy(audio: np.ndarray, frame_len: int) -> np.ndarray:
+    """RMS energy of consecutive non-overlapping frames."""
+    n = len(audio) // frame_len
+    frames = audio[: n * frame_len].reshape(n, frame_len)
+    return np.sqrt(np.mean(frames ** 2, axis=1))
+
+def detect_speech(audio: np.ndarray, sample_rate: int = SAMPLE_RATE, margin_db: float = 12.0,
+                  min_silence_s: float = 0.6, pad_s: float = 0.2) -> List[Tuple[int, int]]:
+    """Energy-based voice activity detection.
+
+    A frame is speech when its level is `margin_db` above the noise floor
+    (10th percentile of frame levels), capped 20 dB below the loud frames so
+    audio with no pauses is not trimmed into its quieter words, and above
+    SILENCE_DB. Pauses shorter
+    than `min_silence_s` are kept and every region is padded by `pad_s`.
+
+    Returns (start, end) sample offsets of the speech regions.
+    """
+    frame_len = int(FRAME_SECONDS * sample_rate)
+    energy = frame_energy(audio, frame_len)
+    if not len(energy):
+        return [(0, len(audio))] if len(audio) else []
+
+    level = 20 * np.log10(energy + 1e-10)
+    floor, loud = np.percentile(level, [10, 90])
+    mask = (level > min(floor + margin_db, loud - 20.0)) & (level > SILENCE_DB)
+
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.astype(np.int8), [0]))))
+    starts, ends = edges[0::2], edges[1::2]
+    if not len(starts):
+        return []
+
+    pad = int(pad_s / FRAME_SECONDS)
+    starts = np.maximum(starts - pad, 0)
+    ends = np.minimum(ends + pad, len(energy))
+
+    # Merge regions separated by pauses too short to be worth cutting
+    keep = (starts[1:] - ends[:-1]) >= int(min_silence_s / FRAME_SECONDS)
+    starts = np.concatenate((starts[:1], starts[1:][keep]))
+    ends = np.concatenate((ends[:-1][keep], ends[-1:]))
+
+    regions = [(int(s) * frame_len, int(e) * frame_len) for s, e in zip(starts, ends)]
+    if ends[-1] == len(energy):
+        regions[-1] = (regions[-1][0], len(audio))  # keep the partial tail frame
+    return regions
+
+class SpeechTimeline:
+    """Speech-only audio plus the mapping from its timeline back to the original."""
+
+    def __init__(self, audio: np.ndarray, regions: List[Tuple[int, int]], sample_rate: int = SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.original_samples = len(audio)
+        self.regions = regions
+        self.audio = np.concatenate([audio[s:e] for s, e in regions]) if regions else audio[:0]
+        lengths = np.array([e - s for s, e in regions], dtype=np.int64)
+        # Where each region starts in the trimmed and in the original audio
+        self._trimmed_starts = np.concatenate(([0], np.cumsum(lengths)[:-1])) if regions else np.zeros(0, np.int64)
+        self._original_starts = np.array([s for s, _ in regions], dtype=np.int64)
+
+    @property
+    def removed_s(self) -> float:
+        return (self.original_samples - len(self.audio)) / self.sample_rate
+
+    @property
+    def removed_ratio(self) -> float:
+        return (self.original_samples - len(self.audio)) / self.original_samples if self.original_samples else 0.0
+
+    def to_original(self, seconds: float, end: bool = False) -> float:
+        """Map a time in the trimmed audio to the same moment in the original.
+
+        A time exactly on a region boundary maps to the start of the later
+        region, or with `end=True` to the end of the earlier one.
+        """
+        if not self.regions:
+            return seconds
+        sample = seconds * self.sample_rate
+        side = "left" if end else "right"
+        i = max(0, int(np.searchsorted(self._trimmed_starts, sample, side=side)) - 1)
+        return float(self._original_starts[i] + sample - self._trimmed_starts[i]) / self.sample_rate
+
+def trim_silence(audio: np.ndarray, sample_rate: int = SAMPLE_RATE, **vad_kwargs) -> SpeechTimeline:
+    """Drop non-speech stretches; see `detect_speech` for the tuning knobs."""
+    return SpeechTimeline(audio, detect_speech(audio, sample_rate, **vad_kwargs), sample_rate)
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+META_NAME = "meta.json"
+
+
+def _write_json(path: str, data: Dict[str, Any]) -> None:
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _read_json(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class VideoCache:
+    """On-disk cache of per-video artifacts, keyed by YouTube video id.
+
+    Layout under `root/<video_id>/`:
+        meta.json                   created / last access times, transcript source
+        transcript.txt              caption or Whisper transcript
+        summaries/<key>.json        one summary per model / prompt version / reduce mode
+        chroma/<embedding model>/   the video's own Chroma collection
+
+    Videos not accessed for `max_age_days` are dropped, then the least recently
+    used ones until the cache fits in `max_bytes`.
+    """
+
+    def __init__(self, root: str = ".cache/videos", max_bytes: int = 2 * 1024 ** 3, max_age_days: float = 30):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    # ---------------- paths & bookkeeping ----------------
+    def video_dir(self, video_id: str) -> str:
+        return os.path.join(self.root, video_id)
+
+    def lock(self, video_id: str) -> threading.Lock:
+        """Per-video lock for work that must not run twice concurrently (e.g. building the collection)."""
+        with self._locks_guard:
+            return self._locks.setdefault(video_id, threading.Lock())
+
+    def _meta(self, video_id: str) -> Dict[str, Any]:
+        return _read_json(os.path.join(self.video_dir(video_id), META_NAME)) or {"video_id": video_id, "created": time.time()}
+
+    def _update_meta(self, video_id: str, **fields: Any) -> None:
+        os.makedirs(self.video_dir(video_id), exist_ok=True)
+        meta = self._meta(video_id)
+        meta.update(fields, last_access=time.time())
+        _write_json(os.path.join(self.video_dir(video_id), META_NAME), meta)
+
+    def touch(self, video_id: str) -> None:
+        if os.path.isdir(self.video_dir(video_id)):
+            self._update_meta(video_id)
+
+    # ---------------- transcript ----------------
+    def get_transcript(self, video_id: str) -> Optional[str]:
+        path = os.path.join(self.video_dir(video_id), "transcript.txt")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            transcript = f.read()
+        self.touch(video_id)
+        return transcript
+
+    def put_transcript(self, video_id: str, transcript: str, source: str) -> None:
+        os.makedirs(self.video_dir(video_id), exist_ok=True)
+        path = os.path.join(self.video_dir(video_id), "transcript.txt")
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(transcript)
+        os.replace(tmp, path)
+        self._update_meta(video_id, transcript_source=source, transcript_chars=len(transcript))
+        self.evict(keep=[video_id])
+
+    # ---------------- summaries ----------------
+    @staticmethod
+    def summary_key(**params: Any) -> str:
+        """Stable key for the settings a summary depends on (model, prompt version, ...)."""
+        return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+    def get_summary(self, video_id: str, key: str) -> Optional[Dict[str, Any]]:
+        entry = _read_json(os.path.join(self.video_dir(video_id), "summaries", f"{key}.json"))
+        if entry is not None:
+            self.touch(video_id)
+        return entry
+
+    def put_summary(self, video_id: str, key: str, entry: Dict[str, Any]) -> None:
+        directory = os.path.join(self.video_dir(video_id), "summaries")
+        os.makedirs(directory, exist_ok=True)
+        _write_json(os.path.join(directory, f"{key}.json"), entry)
+        self._update_meta(video_id)
+        self.evict(keep=[video_id])
+
+    # ---------------- vector collection ----------------
+    def collection_dir(self, video_id: str, embedding_model: str) -> str:
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", embedding_model)
+        return os.path.join(self.video_dir(video_id), "chroma", slug)
+
+    def has_collection(self, video_id: str, embedding_model: str) -> bool:
+        # Written only after the collection was fully built and persisted
+        return os.path.exists(os.path.join(self.collection_dir(video_id, embedding_model), "complete"))
+
+    def mark_collection(self, video_id: str, embedding_model: str, chunks: int) -> None:
+        directory = self.collection_dir(video_id, embedding_model)
+        os.makedirs(directory, exist_ok=True)
+        _write_json(os.path.join(directory, "complete"), {"chunks": chunks, "built": time.time()})
+        self._update_meta(video_id)
+        self.evict(keep=[video_id])
+
+    def clear_collection(self, video_id: str, embedding_model: str) -> None:
+        """Remove a partially built collection before rebuilding it."""
+        shutil.rmtree(self.collection_dir(video_id, embedding_model), ignore_errors=True)
+
+    # ---------------- eviction ----------------
+    def entries(self) -> List[Dict[str, Any]]:
+        """Cached videos with their last access time and size on disk."""
+        result = []
+        if not os.path.isdir(self.root):
+            return result
+        for video_id in os.listdir(self.root):
+            path = self.video_dir(video_id)
+            if not os.path.isdir(path):
+                continue
+            meta = self._meta(video_id)
+            result.append({
+                "video_id": video_id,
+                "last_access": meta.get("last_access", os.path.getmtime(path)),
+                "bytes": _dir_size(path),
+            })
+        return result
+
+    def evict(self, keep: Optional[List[str]] = None) -> List[str]:
+        """Drop expired videos, then least recently used ones until under `max_bytes`."""
+        keep = set(keep or [])
+        cutoff = time.time() - self.max_age_days * 86400
+        entries = sorted(self.entries(), key=lambda e: e["last_access"])
+        total = sum(e["bytes"] for e in entries)
+        removed = []
+        for entry in entries:
+            if entry["video_id"] in keep:
+                continue
+            if entry["last_access"] >= cutoff and total <= self.max_bytes:
+                continue
+            # Collections still open elsewhere may be locked (Windows); skip what cannot be removed
+            shutil.rmtree(self.video_dir(entry["video_id"]), ignore_errors=True)
+            if not os.path.exists(self.video_dir(entry["video_id"])):
+                total -= entry["bytes"]
+                removed.append(entry["video_id"])
+        if removed:
+            print(f"Video cache evicted: {', '.join(removed)}")
+        return removed
+
+
+video_cache = VideoCache(
+    root=os.getenv("VIDEO_CACHE_DIR", ".cache/videos"),
+    max_bytes=int(float(os.getenv("VIDEO_CACHE_MAX_MB", "2048")) * 1024 ** 2),
+    max_age_days=float(os.getenv("VIDEO_CACHE_MAX_AGE_DAYS", "30")),
+)
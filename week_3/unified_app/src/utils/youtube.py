@@ -1,6 +1,8 @@
 import os
+import shutil
 import subprocess
 import sys
+import tempfile
 from typing import Optional, Dict, Any, List
 from youtube_transcript_api import YouTubeTranscriptApi, NoTranscriptFound
 import re
@@ -24,16 +26,26 @@ def get_youtube_transcript(url: str, languages: Optional[List[str]] = None) -> O
     except Exception:
         return None
 
+# Audio-only formats Whisper (via ffmpeg) reads directly, best first; no post-processing needed
+AUDIO_FORMAT = "bestaudio[ext=m4a]/bestaudio[ext=webm]/bestaudio/best"
+
 def download_audio_with_ytdlp(url: str) -> Optional[str]:
+    """Download the video's native audio stream into a directory unique to this request.
+
+    No mp3 re-encode: Whisper decodes m4a/webm directly. The caller owns the
+    returned file and may delete its directory once transcribed.
+    """
     os.makedirs(AUDIO_OUT, exist_ok=True)
-    out_path = os.path.join(AUDIO_OUT, "yt_audio.%(ext)s")
+    # Per-request directory, so concurrent downloads never see each other's files
+    out_dir = tempfile.mkdtemp(prefix=f"{_extract_video_id(url) or 'yt'}-", dir=AUDIO_OUT)
+    out_path = os.path.join(out_dir, "audio.%(ext)s")
     cmd = [
         sys.executable,
         "-m",
         "yt_dlp",
-        "-x",
-        "--audio-format",
-        "mp3",
+        "--no-playlist",
+        "-f",
+        AUDIO_FORMAT,
         "-o",
         out_path,
     ]
@@ -64,60 +76,19 @@ def download_audio_with_ytdlp(url: str) -> Optional[str]:
         # Don't return yet - check if the file was downloaded anyway
     except FileNotFoundError as e:
         print(f"File not found error: {e}")
+        shutil.rmtree(out_dir, ignore_errors=True)
         return None
     except Exception as e:
         print(f"Unexpected error: {e}")
+        shutil.rmtree(out_dir, ignore_errors=True)
         return None
     
-    # Check if the file exists (even if yt-dlp had postprocessing errors)
-    try:
-        for f in os.listdir(AUDIO_OUT):
-            if f.startswith("yt_audio") and (f.endswith(".mp3") or f.endswith(".webm")):
-                audio_path = os.path.join(AUDIO_OUT, f)
-                print(f"Found audio file: {audio_path}")
-                
-                # If it's mp3, return it immediately
-                if f.endswith(".mp3"):
-                    return audio_path
-                
-                # If it's webm and we have ffmpeg, try to convert it
-                if f.endswith(".webm") and ffmpeg_loc:
-                    mp3_path = audio_path.replace(".webm", ".mp3")
-                    if not os.path.exists(mp3_path):
-                        print(f"Converting webm to mp3...")
-                        # Build correct ffmpeg executable path
-                        if os.path.isdir(ffmpeg_loc):
-                            ffmpeg_exe = os.path.join(ffmpeg_loc, "ffmpeg.exe")
-                        elif os.path.isfile(ffmpeg_loc):
-                            ffmpeg_exe = ffmpeg_loc
-                        else:
-                            print(f"Invalid ffmpeg location: {ffmpeg_loc}")
-                            return audio_path  # Return webm as fallback
-                        
-                        if not os.path.isfile(ffmpeg_exe):
-                            print(f"ffmpeg.exe not found at: {ffmpeg_exe}")
-                            return audio_path  # Return webm as fallback
-                        
-                        convert_cmd = [
-                            ffmpeg_exe, "-i", audio_path,
-                            "-vn", "-acodec", "libmp3lame", "-q:a", "2",
-                            mp3_path, "-y"
-                        ]
-                        try:
-                            print(f"Running conversion: {' '.join(convert_cmd)}")
-                            subprocess.run(convert_cmd, check=True, capture_output=True, text=True)
-                            print(f"Converted to: {mp3_path}")
-                            return mp3_path
-                        except Exception as conv_err:
-                            print(f"Conversion failed: {conv_err}, returning webm")
-                            return audio_path
-                    else:
-                        print(f"MP3 already exists: {mp3_path}")
-                        return mp3_path
-                
-                # Return webm if no conversion attempted
-                return audio_path
-    except Exception as e:
-        print(f"Error listing directory: {e}")
-    
-    return None
\ No newline at end of file
+    # The directory is ours alone: whatever finished downloading in it is the audio
+    files = [f for f in os.listdir(out_dir) if f.startswith("audio.") and not f.endswith((".part", ".ytdl"))]
+    if files:
+        audio_path = os.path.join(out_dir, files[0])
+        print(f"Found audio file: {audio_path}")
+        return audio_path
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    return None
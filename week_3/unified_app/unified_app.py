@@ -1,17 +1,20 @@
 
 import os
 import tempfile
-from typing import Dict, List
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import streamlit as st
 from dotenv import load_dotenv
 
 from src.rag.indexer import build_or_update_index
-from src.rag.qa import ask as rag_ask
-from src.summarizers.news import summarize_article_text
-from src.summarizers.youtube import process_youtube, qa_over_documents
-from src.utils.audio import tts_elevenlabs, transcribe_audio
-from src.utils.news import fetch_article
+from src.rag.qa import stream_ask as rag_stream_ask
+from src.summarizers.news import stream_article_summary, stream_digest_summary
+from src.summarizers.youtube import stream_youtube, qa_over_documents
+from src.utils.audio import transcribe_with_stats, whisper_registry
+from src.utils.tts import ElevenLabsSynthesizer, SpeechPipeline
+from src.utils.news import ArticleFetcher, fetch_article
+from src.utils.extractive import DEFAULT_KEEP_RATIO
 
 load_dotenv()
 
@@ -28,6 +31,8 @@ def _init_session_state():
     defaults: Dict[str, object] = {
         "news_summary": None,
         "news_meta": None,
+        "digest_summary": None,
+        "digest_meta": None,
         "yt_summary": None,
         "yt_vector": None,
         "yt_chat": [],
@@ -80,8 +85,99 @@ def _require_openai_key(api_key: str) -> bool:
     return True
 
 
+def _render_summary_stream(events: Iterator[Tuple[str, Any]], render_interval: float = 0.1) -> Dict[str, Any]:
+    """Show summarizer progress as it happens and return the final result.
+
+    Section notes appear as each map call finishes, then the final summary is
+    written token by token (re-rendered at most every `render_interval` seconds).
+    """
+    status = st.empty()
+    progress = st.progress(0.0)
+    notes = st.expander("Section notes (live)", expanded=True)
+    summary_box = st.empty()
+    total, done, summary, last_render = 0, 0, "", 0.0
+    result: Dict[str, Any] = {}
+
+    for kind, payload in events:
+        if kind == "status":
+            status.info(payload)
+        elif kind == "plan":
+            status.info(
+                f"Planned {payload['calls']} LLM calls ({payload['map_calls']} map + {payload['reduce_calls']} reduce)"
+                f" · ~{payload['input_tokens']:,} input tokens"
+            )
+        elif kind == "chunks":
+            total = payload
+            status.info(f"Summarizing {total} sections...")
+        elif kind == "point":
+            index, text = payload
+            done += 1
+            progress.progress(done / max(total, 1), text=f"Sections summarized: {done}/{total}")
+            notes.markdown(f"**Section {index + 1}**\n\n{text}")
+        elif kind == "reduce":
+            status.info(f"Combining {payload} section notes into the final summary..." if done
+                        else "Short enough for a single call: summarizing directly...")
+        elif kind == "token":
+            summary += payload
+            if time.monotonic() - last_render >= render_interval:
+                summary_box.markdown(summary + "▌")
+                last_render = time.monotonic()
+        elif kind == "done":
+            result = payload
+
+    # The finished summary is rendered from session state by the tab itself
+    status.empty()
+    progress.empty()
+    summary_box.empty()
+    return result
+
+
+def _timings_text(timings: Optional[Dict[str, float]]) -> str:
+    if not timings:
+        return ""
+    return " · " + " · ".join(f"{phase[:-2]} {seconds:.1f}s" for phase, seconds in timings.items())
+
+
+def _plan_text(plan: Optional[Dict[str, Any]]) -> str:
+    if not plan:
+        return ""
+    return (
+        f" · {plan['calls']} LLM calls planned ({plan['map_calls']} map + {plan['reduce_calls']} reduce,"
+        f" ≤{plan['chunk_tokens']:,} tokens per chunk, ~{plan['input_tokens']:,} input tokens)"
+    )
+
+
+def _prefilter_text(stats: Optional[Dict[str, Any]]) -> str:
+    if not stats:
+        return ""
+    return (
+        f" · Prefilter kept {stats['kept']}/{stats['sentences']} sentences"
+        f" ({stats['tokens_in']:,} → {stats['tokens_out']:,} tokens, {stats['compression']:.0%})"
+    )
+
+
+def _embedding_cache_caption(stats: Optional[Dict[str, Any]]):
+    if not stats:
+        return
+    st.caption(
+        f"Embedding cache · hit rate {stats['hit_rate']:.0%} ({stats['hits']} hits / {stats['misses']} misses)"
+        f" · {stats['entries']} vectors · {stats['size_bytes'] / 1e6:.1f} MB · evictions: {stats['evictions']}"
+    )
+
+
 _init_session_state()
 
+
+@st.cache_resource(show_spinner="Loading Whisper model...")
+def _warm_whisper(model_name: str) -> bool:
+    # Runs once per server process; later reruns reuse the resident model
+    whisper_registry.warmup([model_name])
+    return True
+
+
+if os.getenv("WHISPER_WARMUP", "false").lower() == "true":
+    _warm_whisper(os.getenv("WHISPER_MODEL", "base"))
+
 # ---------------- Sidebar configuration ----------------
 st.sidebar.header("⚙️ Configuration")
 
@@ -207,6 +303,16 @@ model_temperature = st.sidebar.slider(
     step=0.1,
 )
 
+extractive_keep = st.sidebar.slider(
+    "Extractive prefilter (share of sentences kept)",
+    min_value=0.1,
+    max_value=1.0,
+    value=DEFAULT_KEEP_RATIO or 1.0,
+    step=0.05,
+    help="Rank sentences locally (TextRank) and summarize only the top share. 1.0 sends the full text.",
+)
+extractive_ratio = extractive_keep if extractive_keep < 1.0 else None
+
 st.sidebar.divider()
 
 # FFmpeg location for YouTube audio processing
@@ -334,18 +440,21 @@ with news_tab:
                 elif provider_choice == "aimlapi":
                     os.environ["AIMLAPI_API_KEY"] = aimlapi_api_key
                 
-                with st.spinner("Summarizing article..."):
-                    result = summarize_article_text(
-                        text=article_text,
-                        provider=provider_choice,
-                        model=model_final,
-                        style=style_value,
-                        temperature=model_temperature,
-                    )
+                result = _render_summary_stream(stream_article_summary(
+                    text=article_text,
+                    provider=provider_choice,
+                    model=model_final,
+                    style=style_value,
+                    temperature=model_temperature,
+                    extractive_ratio=extractive_ratio,
+                ))
                 st.session_state["news_summary"] = result["summary"]
                 st.session_state["news_meta"] = {
                     "chunks": result["chunks"],
+                    "plan": result["plan"],
+                    "prefilter": result["prefilter"],
                     "style": style_label,
+                    "timings": result["timings"],
                 }
 
     if st.session_state.get("news_summary"):
@@ -354,8 +463,86 @@ with news_tab:
         meta = st.session_state.get("news_meta", {})
         st.caption(
             f"Chunks processed: {meta.get('chunks', '?')} · Style: {meta.get('style', style_label)}"
+            + _plan_text(meta.get("plan"))
+            + _prefilter_text(meta.get("prefilter"))
+            + _timings_text(meta.get("timings"))
         )
 
+    st.divider()
+    st.subheader("🗞️ Morning Digest")
+    st.write("Paste many article URLs (one per line) to fetch them concurrently and summarize them as one digest.")
+    digest_urls_raw = st.text_area("Article URLs", height=150, placeholder="https://example.com/story-1\nhttps://example.com/story-2")
+
+    if st.button("Summarize Digest"):
+        digest_urls = list(dict.fromkeys(u.strip() for u in digest_urls_raw.splitlines() if u.strip()))
+        if not _require_openai_key(openai_api_key):
+            pass
+        elif not digest_urls:
+            st.warning("Please enter at least one article URL.")
+        else:
+            fetcher = ArticleFetcher()
+            fetch_progress = st.progress(0.0)
+            texts: List[Optional[str]] = [None] * len(digest_urls)
+            fetch_start = time.perf_counter()
+            for done, (i, text) in enumerate(fetcher.iter_fetch(digest_urls), start=1):
+                texts[i] = text
+                fetch_progress.progress(done / len(digest_urls), text=f"Fetched {done}/{len(digest_urls)} articles")
+            fetch_s = time.perf_counter() - fetch_start
+            fetch_progress.empty()
+
+            articles = [(url, text) for url, text in zip(digest_urls, texts) if text]
+            failed = [url for url, text in zip(digest_urls, texts) if not text]
+            if failed:
+                st.warning("Could not fetch: " + ", ".join(failed))
+            if articles:
+                if provider_choice == "openai":
+                    os.environ["OPENAI_API_KEY"] = openai_api_key
+                elif provider_choice == "groq":
+                    os.environ["GROQ_API_KEY"] = groq_api_key
+                elif provider_choice == "aimlapi":
+                    os.environ["AIMLAPI_API_KEY"] = aimlapi_api_key
+
+                result = _render_summary_stream(stream_digest_summary(
+                    articles,
+                    provider=provider_choice,
+                    model=model_final,
+                    style=style_value,
+                    temperature=model_temperature,
+                    extractive_ratio=extractive_ratio,
+                ))
+                st.session_state["digest_summary"] = result["summary"]
+                st.session_state["digest_meta"] = {
+                    "articles": result["articles"],
+                    "chunks": result["chunks"],
+                    "dedup": result["dedup"],
+                    "plan": result["plan"],
+                    "prefilter": result["prefilter"],
+                    "fetch": dict(fetcher.stats),
+                    "timings": {"fetch_s": fetch_s, **result["timings"]},
+                }
+
+    if st.session_state.get("digest_summary"):
+        st.markdown(st.session_state["digest_summary"])
+        meta = st.session_state.get("digest_meta", {})
+        fetch = meta.get("fetch", {})
+        st.caption(
+            f"Articles: {meta.get('articles', '?')} · Chunks processed: {meta.get('chunks', '?')}"
+            f" · HTML cache: {fetch.get('fresh', 0) + fetch.get('not_modified', 0)} reused"
+            f" ({fetch.get('not_modified', 0)} revalidated), {fetch.get('downloaded', 0)} downloaded"
+            + _plan_text(meta.get("plan"))
+            + _prefilter_text(meta.get("prefilter"))
+            + _timings_text(meta.get("timings"))
+        )
+        dedup = meta.get("dedup") or {}
+        if dedup.get("duplicates"):
+            st.caption(
+                f"Near-duplicates: {dedup['articles']} articles → {dedup['stories']} stories"
+                f" · ~{dedup['map_calls_saved']} map calls and {dedup['tokens_saved']:,} tokens saved"
+            )
+            with st.expander("Stories with several sources"):
+                for urls in dedup["clusters"]:
+                    st.markdown("- " + " · ".join(urls))
+
 # ---------------- Tab 2: YouTube Summarizer ----------------
 with youtube_tab:
     st.header("🎥 YouTube Summarizer & Conversational Q&A")
@@ -394,15 +581,15 @@ with youtube_tab:
                 if st.session_state.get("ffmpeg_location"):
                     os.environ["FFMPEG_LOCATION"] = st.session_state["ffmpeg_location"]
                 
-                with st.spinner("Processing video: transcript → summary → vector store..."):
-                    result = process_youtube(
-                        url=youtube_url,
-                        provider=provider_choice,
-                        model=model_final,
-                        embeddings_provider="openai",
-                        temperature=model_temperature,
-                        persist_dir=".chroma/video",
-                    )
+                result = _render_summary_stream(stream_youtube(
+                    url=youtube_url,
+                    provider=provider_choice,
+                    model=model_final,
+                    embeddings_provider="openai",
+                    temperature=model_temperature,
+                    persist_dir=".chroma/video",
+                    extractive_ratio=extractive_ratio,
+                ))
             except Exception as exc:
                 st.error(f"Video processing failed: {exc}")
                 _clear_youtube_state()
@@ -412,7 +599,14 @@ with youtube_tab:
                 st.session_state["yt_chat"] = []
                 st.success(
                     f"Transcript characters: {result['transcript_chars']} · Chunks: {result['chunks']}"
+                    + _plan_text(result.get("plan"))
+                    + _prefilter_text(result.get("prefilter"))
+                    + _timings_text(result.get("timings"))
                 )
+                reused = [name for name, hit in result.get("cached", {}).items() if hit]
+                if reused:
+                    st.caption(f"Reused from the video cache: {', '.join(reused)}")
+                _embedding_cache_caption(result.get("embedding_cache"))
 
     if st.session_state.get("yt_summary"):
         st.subheader("Video Summary")
@@ -469,6 +663,12 @@ with voice_tab:
         type=["pdf", "txt", "md"],
         accept_multiple_files=True,
     )
+    # The uploader only holds this session's files, so pruning is opt-in
+    prune_missing = st.checkbox(
+        "Remove documents not in this upload",
+        value=False,
+        help="Drop previously indexed documents that are not among the files above",
+    )
 
     if st.button("Build / Update Knowledge Base", type="primary"):
         if not _require_openai_key(openai_api_key):
@@ -483,19 +683,25 @@ with voice_tab:
                     handle.write(file.getbuffer())
                 tmp_paths.append(tmp_path)
             try:
-                with st.spinner("Creating vector store from documents..."):
-                    vect = build_or_update_index(
+                with st.spinner("Updating vector store from documents..."):
+                    index = build_or_update_index(
                         files=tmp_paths,
                         persist_dir=persist_dir,
                         embeddings_provider="openai",
+                        prune=prune_missing,
                     )
             except Exception as exc:
                 st.error(f"Vector store build failed: {exc}")
                 _clear_voice_state()
             else:
-                st.session_state["voice_vector"] = vect
+                st.session_state["voice_vector"] = index["vector"]
                 st.session_state["voice_chat"] = []
-                st.success("Knowledge base ready.")
+                st.success(
+                    f"Knowledge base ready · {index['files']} files uploaded, {index['documents']} in store"
+                    f" · chunks added: {index['added']}"
+                    f" · skipped: {index['skipped']} · removed: {index['removed']}"
+                )
+                _embedding_cache_caption(index.get("embedding_cache"))
 
     st.divider()
     st.subheader("Ask Your Knowledge Base")
@@ -520,8 +726,17 @@ with voice_tab:
             with open(tmp_audio, "wb") as temp_audio:
                 temp_audio.write(audio_upload.read())
             with st.spinner("Transcribing audio with Whisper..."):
-                user_question = transcribe_audio(tmp_audio)
+                transcription = transcribe_with_stats(tmp_audio)
+            user_question = transcription["text"]
             st.info(f"Transcribed: {user_question}")
+            st.caption(
+                f"Whisper '{transcription['model']}' · {transcription['audio_s']:.1f}s audio in"
+                f" {transcription['transcribe_s']:.1f}s (RTF {transcription['rtf'] or 0:.2f})"
+                f" · model load {transcription['load_s'] or 0:.1f}s (once per process)"
+                f" · silence trimmed {transcription['vad_removed_s']:.1f}s"
+            )
+
+    speak_answer = st.checkbox("🔊 Speak the answer with ElevenLabs", key="voice_tts")
 
     if st.button("Ask Knowledge Base"):
         if not _require_openai_key(openai_api_key):
@@ -538,26 +753,59 @@ with voice_tab:
                 os.environ["GROQ_API_KEY"] = groq_api_key
             elif provider_choice == "aimlapi":
                 os.environ["AIMLAPI_API_KEY"] = aimlapi_api_key
-            
-            with st.spinner("Generating grounded answer..."):
-                answer = rag_ask(
+
+            # Sentences are synthesized while the answer is still being generated
+            speech = None
+            if speak_answer:
+                if elevenlabs_api_key:
+                    speech = SpeechPipeline(ElevenLabsSynthesizer(api_key=elevenlabs_api_key))
+                else:
+                    st.warning("TTS unavailable. Ensure ELEVEN_LABS_API_KEY is configured.")
+
+            answer_box = st.empty()
+            speech_box = st.container()
+            answer = ""
+            clips: List[bytes] = []
+
+            def _play(clip: bytes):
+                # The first sentence starts playing as soon as it is synthesized; the rest are
+                # collected for one player of the whole answer (Streamlit cannot queue clips)
+                if not clips:
+                    with speech_box:
+                        st.audio(clip, format="audio/mp3", autoplay=True)
+                clips.append(clip)
+
+            try:
+                for token in rag_stream_ask(
                     vect=st.session_state["voice_vector"],
                     question=user_question,
                     provider=provider_choice,
                     model=model_final,
                     temperature=model_temperature,
-                )
-            st.session_state["voice_chat"].append({"role": "user", "content": user_question})
-            st.session_state["voice_chat"].append({"role": "assistant", "content": answer})
-            st.markdown(answer)
+                ):
+                    answer += token
+                    answer_box.markdown(answer + "▌")
+                    if speech:
+                        speech.feed(token)
+                        for clip in speech.ready():
+                            _play(clip)
+                answer_box.markdown(answer)
+                st.session_state["voice_chat"].append({"role": "user", "content": user_question})
+                st.session_state["voice_chat"].append({"role": "assistant", "content": answer})
 
-            if st.checkbox("🔊 Play answer with ElevenLabs"):
-                with st.spinner("Generating speech..."):
-                    speech = tts_elevenlabs(answer)
                 if speech:
-                    st.audio(speech, format="audio/mp3")
-                else:
-                    st.warning("TTS unavailable. Ensure ELEVEN_LABS_API_KEY is configured.")
+                    with st.spinner("Finishing speech..."):
+                        for clip in speech:
+                            _play(clip)
+                    if len(clips) > 1:
+                        with speech_box:
+                            st.caption("Full answer")
+                            st.audio(b"".join(clips), format="audio/mp3")
+                    st.caption(f"{speech.sentences} sentences · audio cache hits: {speech.cache.stats['hits']}")
+            finally:
+                # An LLM or TTS error must not leave the synthesis pool running
+                if speech:
+                    speech.shutdown()
 
     if st.session_state.get("voice_chat"):
         st.divider()